@@ -0,0 +1,368 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import sys
+import threading
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+import storage
+from storage import PAGE_SIZE, STATUSES, SYNC_OVERLAP, ConflictError, TaskRepository, init_db
+
+# HTTP/JSON access to the board for scripts and other tools, so they go
+# through TaskRepository (versions, tombstones, the change feed) instead of
+# writing to the tables directly.
+#
+#   python api_server.py                  # 127.0.0.1:8765
+#   TODO_API=1 python index4.py           # the same server inside the app
+#
+#   GET    /tasks?status=todo&limit=100&cursor=...&q=...   one page, oldest first
+#   POST   /tasks       {"description": "...", "status": "todo"}
+#   PATCH  /tasks/<id>  {"status": "done"}
+#   DELETE /tasks/<id>
+#
+# Tasks carry their version as ETag; send it back as If-Match on PATCH and
+# DELETE to get 412 instead of overwriting someone else's change. Pages
+# carry an ETag too, and a GET with a matching If-None-Match gets 304. While
+# the board is quiet, repeated GETs are answered from memory after one
+# indexed query (see TaskRepository.board_stamp).
+#
+# Requests are parsed on one asyncio loop; database calls run on API_WORKERS
+# threads, each with its own TaskRepository, sharing the engine's pool.
+
+# ---------- CONFIG ----------
+API_HOST = os.environ.get('TODO_API_HOST', '127.0.0.1')   # keep it local, there is no authentication
+API_PORT = int(os.environ.get('TODO_API_PORT', '8765'))
+API_WORKERS = storage.POOL_SIZE    # database threads, at most one pooled connection each
+MAX_LIMIT = 1000                   # tasks per page
+MAX_BODY = 64 * 1024               # bytes
+PAGE_CACHE_SIZE = 256              # pages kept for conditional GETs
+IDLE_TIMEOUT = 30                  # seconds before an idle keep-alive connection is closed
+
+class HTTPError(Exception):
+    def __init__(self, status, message, task=None):
+        super().__init__(message)
+        self.status = status
+        self.task = task  # current state to send back with a conflict
+
+def task_json(task):
+    return {
+        'id': task.id,
+        'description': task.description,
+        'status': task.status,
+        'created_at': task.created_at.isoformat() if task.created_at else None,
+        'updated_at': task.updated_at.isoformat() if task.updated_at else None,
+        'version': task.version,
+    }
+
+def task_etag(task):
+    return f'"{task.version}"'
+
+def encode_cursor(task):
+    key = json.dumps([task.created_at.isoformat(), task.id]).encode()
+    return base64.urlsafe_b64encode(key).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        created_at, task_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return datetime.fromisoformat(created_at), int(task_id)
+    except (ValueError, TypeError):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, 'bad cursor') from None
+
+class ApiRepository(TaskRepository):
+    # One per worker thread. A row another worker changed would be stale in
+    # this session's identity map and fail the version check, so nothing is
+    # kept between requests.
+    CACHE_SIZE = 0
+
+class ApiServer:
+    def __init__(self, Session, host=API_HOST, port=API_PORT, workers=API_WORKERS):
+        self.Session = Session
+        self.host = host
+        self.port = port
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='api-db')
+        self.local = threading.local()
+        self.repos = []
+        self.pages = OrderedDict()  # query -> (board stamp, etag, body)
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.ready = threading.Event()
+        self.error = None
+
+    # ---------- lifecycle ----------
+    def run(self):
+        # Serve until stop(), blocking the calling thread
+        asyncio.run(self._serve())
+
+    def start(self):
+        # Serve on a daemon thread, returns once the port is bound
+        self.thread = threading.Thread(target=self.run, name='api', daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        if self.error:
+            raise self.error
+
+    def stop(self):
+        if self.loop and self.server:
+            self.loop.call_soon_threadsafe(self.server.close)
+        if self.thread:
+            self.thread.join()
+
+    async def _serve(self):
+        self.loop = asyncio.get_running_loop()
+        try:
+            self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        except OSError as e:
+            self.error = e
+            return
+        finally:
+            self.ready.set()
+        try:
+            await self.server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            # Not wait_closed(): idle keep-alive connections would hold it up,
+            # asyncio.run() cancels their handlers on the way out
+            self.server.close()
+            self.pool.shutdown(wait=True)
+            for repo in self.repos:
+                repo.close()
+
+    # ---------- database ----------
+    def _call(self, method, args):
+        repo = getattr(self.local, 'repo', None)
+        if repo is None:
+            repo = self.local.repo = ApiRepository(self.Session)
+            self.repos.append(repo)
+        return method(repo, *args)
+
+    async def db(self, method, *args):
+        # method: a TaskRepository function, run with this thread's repository
+        return await self.loop.run_in_executor(self.pool, self._call, method, args)
+
+    # ---------- HTTP ----------
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                    headers = {}
+                    while True:
+                        line = await reader.readline()
+                        if line in (b'\r\n', b'\n', b''):
+                            break
+                        name, _, value = line.decode('latin-1').partition(':')
+                        headers[name.strip().lower()] = value.strip()
+                    length = int(headers.get('content-length') or 0)
+                except ValueError:
+                    self.respond(writer, HTTPStatus.BAD_REQUEST, {}, {'error': 'malformed request'}, False)
+                    break
+                if length < 0:
+                    self.respond(writer, HTTPStatus.BAD_REQUEST, {}, {'error': 'malformed request'}, False)
+                    break
+                if length > MAX_BODY:
+                    self.respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {}, {'error': 'body too large'}, False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection == 'keep-alive' if version == 'HTTP/1.0' else connection != 'close'
+                status, extra_headers, payload = await self.dispatch(method, target, headers, body)
+                self.respond(writer, status, extra_headers, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def respond(writer, status, headers, payload, keep_alive):
+        # payload: a JSON-able object, already encoded bytes, or None
+        if payload is not None and not isinstance(payload, bytes):
+            payload = json.dumps(payload).encode()
+        lines = [f'HTTP/1.1 {status.value} {status.phrase}']
+        if payload is not None:
+            lines.append('Content-Type: application/json')
+        if status != HTTPStatus.NOT_MODIFIED:
+            lines.append(f'Content-Length: {len(payload or b"")}')
+        lines.extend(f'{name}: {value}' for name, value in headers.items())
+        lines.append('Connection: keep-alive' if keep_alive else 'Connection: close')
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + (payload or b''))
+
+    async def dispatch(self, method, target, headers, body):
+        # Returns (status, headers, payload)
+        url = urlsplit(target)
+        parts = [part for part in url.path.split('/') if part]
+        try:
+            if parts == ['tasks']:
+                if method == 'GET':
+                    return await self.list_tasks(parse_qs(url.query), headers)
+                if method == 'POST':
+                    return await self.create_task(self.json_body(body))
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f'{method} not allowed on /tasks')
+            if len(parts) == 2 and parts[0] == 'tasks' and parts[1].isdigit():
+                task_id = int(parts[1])
+                if method == 'PATCH':
+                    return await self.move_task(task_id, self.json_body(body), headers)
+                if method == 'DELETE':
+                    return await self.delete_task(task_id, headers)
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f'{method} not allowed on /tasks/<id>')
+            raise HTTPError(HTTPStatus.NOT_FOUND, f'no resource at {url.path}')
+        except HTTPError as e:
+            payload = {'error': str(e)}
+            if e.task is not None:
+                payload['task'] = task_json(e.task)
+            return e.status, {}, payload
+        except storage.OFFLINE_ERRORS:
+            return HTTPStatus.SERVICE_UNAVAILABLE, {'Retry-After': '5'}, {'error': 'database unavailable'}
+        except Exception as e:
+            traceback.print_exc()
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {}, {'error': str(e)}
+
+    @staticmethod
+    def json_body(body):
+        try:
+            data = json.loads(body or b'{}')
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'body is not JSON') from None
+        if not isinstance(data, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'body must be a JSON object')
+        return data
+
+    @staticmethod
+    def status_param(value):
+        if value not in STATUSES:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"status must be one of: {', '.join(STATUSES)}")
+        return value
+
+    @staticmethod
+    def if_match(headers):
+        # The version an If-Match header names, None without one
+        value = headers.get('if-match')
+        if value is None or value.strip() == '*':
+            return None
+        try:
+            return int(value.strip().removeprefix('W/').strip('"'))
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'If-Match must be a task ETag') from None
+
+    # ---------- endpoints ----------
+    async def list_tasks(self, query, headers):
+        status = self.status_param(query.get('status', [None])[0])
+        cursor = query.get('cursor', [None])[0]
+        search = query.get('q', [None])[0]
+        try:
+            limit = min(int(query.get('limit', [PAGE_SIZE])[0]), MAX_LIMIT)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'limit must be a number') from None
+        if limit < 1:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'limit must be positive')
+        after = decode_cursor(cursor) if cursor else None
+
+        # A cached page is good while nothing changed since it was read; a
+        # stamp younger than SYNC_OVERLAP may still have commits landing
+        key = (status, cursor, limit, search)
+        latest, now = await self.db(TaskRepository.board_stamp)
+        settled = latest is None or now - latest > timedelta(seconds=SYNC_OVERLAP)
+        cached = self.pages.get(key)
+        if settled and cached and cached[0] == latest:
+            self.pages.move_to_end(key)
+            _, etag, body = cached
+        else:
+            tasks = await self.db(TaskRepository.page, status, after, limit, search)
+            body = json.dumps({
+                'tasks': [task_json(task) for task in tasks],
+                'next_cursor': encode_cursor(tasks[-1]) if len(tasks) == limit else None,
+            }).encode()
+            etag = f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+            if settled:
+                self.pages[key] = (latest, etag, body)
+                self.pages.move_to_end(key)
+                while len(self.pages) > PAGE_CACHE_SIZE:
+                    self.pages.popitem(last=False)
+
+        if etag in [tag.strip() for tag in headers.get('if-none-match', '').split(',')]:
+            return HTTPStatus.NOT_MODIFIED, {'ETag': etag}, None
+        return HTTPStatus.OK, {'ETag': etag}, body
+
+    async def create_task(self, data):
+        description = data.get('description')
+        if not isinstance(description, str) or not description.strip():
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'description is required')
+        status = self.status_param(data.get('status', 'todo'))
+        task = await self.db(TaskRepository.create, description.strip(), status)
+        return HTTPStatus.CREATED, {'Location': f'/tasks/{task.id}', 'ETag': task_etag(task)}, task_json(task)
+
+    async def move_task(self, task_id, data, headers):
+        status = self.status_param(data.get('status'))
+        version = self.if_match(headers)
+        try:
+            task = await self.db(TaskRepository.move, task_id, status, version)
+        except LookupError:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f'task #{task_id} not found') from None
+        except ConflictError as e:
+            self.conflict(e, version)
+        return HTTPStatus.OK, {'ETag': task_etag(task)}, task_json(task)
+
+    async def delete_task(self, task_id, headers):
+        version = self.if_match(headers)
+        try:
+            await self.db(TaskRepository.delete, task_id, version)
+        except LookupError:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f'task #{task_id} not found') from None
+        except ConflictError as e:
+            self.conflict(e, version)
+        return HTTPStatus.NO_CONTENT, {}, None
+
+    @staticmethod
+    def conflict(e, version):
+        if e.task is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f'task #{e.task_id} was deleted') from None
+        # 412 when the caller's If-Match failed, 409 when a concurrent
+        # writer won the race for the same row
+        status = HTTPStatus.PRECONDITION_FAILED if version is not None else HTTPStatus.CONFLICT
+        raise HTTPError(status, str(e), e.task) from None
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the task board over HTTP/JSON')
+    parser.add_argument('--host', default=API_HOST)
+    parser.add_argument('--port', type=int, default=API_PORT)
+    parser.add_argument('--workers', type=int, default=API_WORKERS, help='database threads')
+    parser.add_argument('--backend', default=None, choices=sorted(storage.BACKENDS),
+                        help='defaults to TODO_BACKEND')
+    args = parser.parse_args()
+
+    Session = init_db(storage.get_backend(args.backend))
+    server = ApiServer(Session, args.host, args.port, args.workers)
+    try:
+        server.start()
+    except OSError as e:
+        raise SystemExit(f'Cannot listen on {args.host}:{args.port}: {e}')
+    print(f'Serving on http://{args.host}:{args.port}', file=sys.stderr, flush=True)
+    try:
+        while server.thread.is_alive():
+            server.thread.join(0.5)
+    except KeyboardInterrupt:
+        server.stop()
+    finally:
+        Session.kw['bind'].dispose()
+
+if __name__ == '__main__':
+    main()
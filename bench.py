@@ -0,0 +1,288 @@
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+
+import storage
+from journal import Journal
+from storage import PAGE_SIZE, Task, TaskRepository, detached_copy, init_db
+from taskstore import TaskRecord, TaskStore
+
+# Headless benchmarks for board load, mutations and scrolling.
+#
+#   TODO_BACKEND=sqlite python bench.py --sizes 1000,10000 --output bench.json
+#   xvfb-run python bench.py            # also measures the Tk paths
+#
+# SQLite runs use a throwaway file per size. MySQL runs use a separate
+# BENCH_DB_NAME database that is dropped and recreated for every size.
+
+STATUSES = ['todo', 'doing', 'done']
+BENCH_DB_NAME = 'todo_bench'
+SEED_CHUNK = 5000
+
+def percentile(samples, q):
+    # Nearest-rank percentile
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+def summarize(samples):
+    samples_ms = [s * 1000 for s in samples]
+    return {
+        'n': len(samples_ms),
+        'p50_ms': round(percentile(samples_ms, 50), 3),
+        'p90_ms': round(percentile(samples_ms, 90), 3),
+        'p99_ms': round(percentile(samples_ms, 99), 3),
+        'max_ms': round(max(samples_ms), 3),
+    }
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+def peak_memory(fn, *args):
+    tracemalloc.start()
+    try:
+        fn(*args)
+        return tracemalloc.get_traced_memory()[1] // 1024
+    finally:
+        tracemalloc.stop()
+
+def retained_kib(build):
+    # Memory held by what build() returns, measured while it is still alive
+    tracemalloc.start()
+    try:
+        kept = build()
+        retained = tracemalloc.get_traced_memory()[0] // 1024
+        del kept
+        return retained
+    finally:
+        tracemalloc.stop()
+
+def make_backend(name, workdir, size):
+    if name == 'sqlite':
+        return storage.SQLiteBackend(os.path.join(workdir, f'bench_{size}.db'))
+
+    url = sa.engine.make_url(storage.CONN_URL_DB).set(database=BENCH_DB_NAME)
+    server = sa.create_engine(storage.CONN_URL_SERVER, poolclass=sa.pool.NullPool)
+    with server.begin() as conn:
+        conn.execute(sa.text(f'DROP DATABASE IF EXISTS `{BENCH_DB_NAME}`'))
+    server.dispose()
+    return storage.MySQLBackend(url=url.render_as_string(hide_password=False))
+
+def seed(Session, size):
+    start = datetime.utcnow() - timedelta(seconds=size)
+    engine = Session.kw['bind']
+    with engine.begin() as conn:
+        for offset in range(0, size, SEED_CHUNK):
+            rows = [{'description': f'Benchmark task {i} ' + 'lorem ipsum ' * (i % 12),
+                     'status': STATUSES[i % 3],
+                     'created_at': start + timedelta(seconds=i)}
+                    for i in range(offset, min(size, offset + SEED_CHUNK))]
+            conn.execute(Task.__table__.insert(), rows)
+
+def bench_init(backend):
+    # init_db on an existing, migrated schema: the per-launch cost
+    return summarize([timed(init_db, backend)[0] for _ in range(3)])
+
+def bench_db(Session, size, repeat):
+    repo = TaskRepository(Session)
+    limits = {status: PAGE_SIZE for status in STATUSES}
+    results = {}
+
+    results['initial_load'] = summarize([timed(repo.load_board, limits)[0] for _ in range(repeat)])
+    results['initial_load']['peak_kib'] = peak_memory(repo.load_board, limits)
+
+    with Session() as session:
+        ids = list(session.execute(sa.select(Task.id)).scalars())
+    random.shuffle(ids)
+
+    results['move'] = summarize([timed(repo.move, task_id, random.choice(STATUSES))[0]
+                                 for task_id in ids[:repeat]])
+    results['delete'] = summarize([timed(repo.delete, task_id)[0]
+                                   for task_id in ids[repeat:2 * repeat]])
+
+    def scroll_through():
+        samples = []
+        after = None
+        while True:
+            elapsed, page = timed(repo.page, 'todo', after)
+            samples.append(elapsed)
+            if len(page) < PAGE_SIZE:
+                return samples
+            after = (page[-1].created_at, page[-1].id)
+
+    results['scroll_through'] = summarize(scroll_through())
+    results['scroll_through']['peak_kib'] = peak_memory(scroll_through)
+    repo.close()
+    return results
+
+def bench_store(Session):
+    # Per-task memory of what the board holds for every task on it: detached
+    # ORM copies, as the columns used to, against TaskRecords in a TaskStore.
+    # Both share the rows' description strings, which are not counted.
+    with Session() as session:
+        tasks = session.query(Task).all()
+        
+    def fill_store():
+        store = TaskStore()
+        for task in tasks:
+            store.put(TaskRecord.of(task))
+        return store
+        
+    orm_kib = retained_kib(lambda: [detached_copy(task) for task in tasks])
+    store_kib = retained_kib(fill_store)
+    build_time, _ = timed(fill_store)
+    return {
+        'tasks': len(tasks),
+        'orm_kib': orm_kib,
+        'store_kib': store_kib,
+        'orm_bytes_per_task': round(orm_kib * 1024 / len(tasks)) if tasks else 0,
+        'store_bytes_per_task': round(store_kib * 1024 / len(tasks)) if tasks else 0,
+        'store_build_ms': round(build_time * 1000, 3),
+    }
+
+def count_widgets(widget):
+    return 1 + sum(count_widgets(child) for child in widget.winfo_children())
+
+def pump_until(app, done, timeout=60):
+    deadline = time.perf_counter() + timeout
+    while not done():
+        if time.perf_counter() > deadline:
+            raise TimeoutError('UI did not settle')
+        app.update()
+
+def bench_ui(Session, repeat, journal_path):
+    import index4
+    results = {}
+
+    start = time.perf_counter()
+    app = index4.TodoApp(Session, Journal(journal_path))
+    pump_until(app, lambda: app.status_var.get().startswith('Loaded'))
+    app.update_idletasks()
+    results['initial_load'] = summarize([time.perf_counter() - start])
+    results['initial_load']['widgets'] = count_widgets(app)
+
+    def settle(prefix):
+        pump_until(app, lambda: app.status_var.get().startswith(prefix))
+        app.update_idletasks()
+
+    samples = []
+    for _ in range(repeat):
+        task_id = random.choice(list(app.store.records))
+        new_status = random.choice([s for s in STATUSES if s != app.store.status(task_id)])
+        app.status_var.set('')
+        elapsed, _ = timed(lambda: (app.move_task(task_id, new_status), settle('Moved')))
+        samples.append(elapsed)
+    results['move'] = summarize(samples)
+
+    samples = []
+    for _ in range(repeat):
+        task_id = random.choice(list(app.store.records))
+        app.status_var.set('')
+        elapsed, _ = timed(lambda: (app.delete_task(task_id), settle('Deleted')))
+        samples.append(elapsed)
+    results['delete'] = summarize(samples)
+
+    column = app.columns['todo']
+    samples = []
+    while not column.exhausted:
+        rows = len(column.order)
+        column.canvas.yview_moveto(1.0)
+        elapsed, _ = timed(lambda: pump_until(app, lambda: len(column.order) > rows or column.exhausted))
+        samples.append(elapsed)
+    if samples:
+        results['scroll_through'] = summarize(samples)
+    results['scroll_through_widgets'] = count_widgets(app)
+
+    app.on_close()
+    return results
+
+def bench_startup(db_path, journal_path, repeat=3):
+    # Launch the real app against the seeded SQLite file; it prints its own
+    # startup milestones (ms since the process started) and exits
+    env = dict(os.environ, TODO_BACKEND='sqlite', TODO_SQLITE_PATH=db_path,
+               TODO_JOURNAL_PATH=journal_path, TODO_STARTUP_REPORT='1')
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'index4.py')
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, script], env=env, capture_output=True,
+                                text=True, check=True, timeout=120).stdout
+        milestones = json.loads(output.strip().splitlines()[-1])
+        milestones['process_ms'] = (time.perf_counter() - start) * 1000
+        runs.append(milestones)
+    return {name: summarize([run[name] / 1000 for run in runs]) for name in runs[0]}
+
+def ui_available():
+    try:
+        import tkinter
+        tkinter.Tk().destroy()
+        return True
+    except Exception:
+        return False
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark board load, mutation and render paths')
+    parser.add_argument('--sizes', default='1000,10000,100000', help='comma separated task counts to seed')
+    parser.add_argument('--backend', default=None, choices=sorted(storage.BACKENDS),
+                        help='defaults to TODO_BACKEND')
+    parser.add_argument('--repeat', type=int, default=50, help='samples per latency measurement')
+    parser.add_argument('--no-ui', action='store_true', help='skip the Tk measurements')
+    parser.add_argument('--output', default='-', help="JSON output file, '-' for stdout")
+    args = parser.parse_args()
+
+    backend_name = args.backend or storage.STORAGE_BACKEND
+    with_ui = not args.no_ui and ui_available()
+    report = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(timespec='seconds'),
+            'backend': backend_name,
+            'python': platform.python_version(),
+            'sqlalchemy': sa.__version__,
+            'platform': platform.platform(),
+            'page_size': PAGE_SIZE,
+            'repeat': args.repeat,
+            'ui': with_ui,
+        },
+        'results': [],
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in [int(s) for s in args.sizes.split(',')]:
+            backend = make_backend(backend_name, workdir, size)
+            elapsed, Session = timed(init_db, backend)
+            seed_time, _ = timed(seed, Session, size)
+            entry = {'size': size, 'seed_s': round(seed_time, 3),
+                     'init_db_fresh_ms': round(elapsed * 1000, 3),
+                     'init_db': bench_init(backend),
+                     'db': bench_db(Session, size, args.repeat),
+                     'store': bench_store(Session)}
+            if with_ui:
+                entry['ui'] = bench_ui(Session, min(args.repeat, 20),
+                                       os.path.join(workdir, f'journal_{size}.jsonl'))
+                if backend_name == 'sqlite':
+                    entry['startup'] = bench_startup(backend.path, os.path.join(workdir, f'startup_{size}.jsonl'))
+            report['results'].append(entry)
+            Session.kw['bind'].dispose()
+            print(f'{size} tasks done', file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output == '-':
+        print(output)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+import argparse
+import csv
+import json
+import sys
+from datetime import datetime
+
+import storage
+from storage import STATUSES, TaskRepository, init_db, insert_many, stream_tasks
+
+# Command-line access to the task database, without the Tk board.
+#
+#   python cli.py list --status todo
+#   python cli.py add "Write the report" --status doing
+#   python cli.py move 42 done
+#   python cli.py delete 42
+#   python cli.py export tasks.jsonl
+#   python cli.py import tasks.csv
+#
+# Import and export stream: rows are read and inserted, or fetched and
+# written, IMPORT_BATCH at a time, so file size does not matter. Imported
+# tasks get new ids; description is required, status and created_at are
+# optional.
+
+EXPORT_FIELDS = ['id', 'description', 'status', 'created_at', 'updated_at']
+
+def file_format(path, name):
+    if name:
+        return name
+    if path.endswith('.csv'):
+        return 'csv'
+    if path.endswith(('.jsonl', '.ndjson', '.json')):
+        return 'jsonl'
+    raise SystemExit(f"Cannot tell the format of '{path}', pass --format csv or --format jsonl")
+
+def open_file(path, mode):
+    if path == '-':
+        return sys.stdout if 'w' in mode else sys.stdin
+    return open(path, mode, newline='', encoding='utf-8')
+
+def read_rows(f, fmt):
+    # CSV rows as dicts, JSON Lines as the raw lines, parsed by task_values
+    if fmt == 'csv':
+        yield from csv.DictReader(f)
+    else:
+        for line in f:
+            if line.strip():
+                yield line
+
+def task_values(record, line):
+    # One input record as the column dict insert_many expects; every
+    # problem is reported with the record's number
+    if isinstance(record, str):
+        try:
+            record = json.loads(record)
+        except ValueError as e:
+            raise ValueError(f'record {line}: not valid JSON ({e})')
+    if not isinstance(record, dict):
+        raise ValueError(f'record {line}: expected an object with a description')
+    description = record.get('description')
+    if not isinstance(description, str) or not description.strip():
+        raise ValueError(f'record {line}: description is required')
+    status = record.get('status') or 'todo'
+    if status not in STATUSES:
+        raise ValueError(f"record {line}: unknown status '{status}'")
+    created_at = record.get('created_at')
+    if not created_at:
+        return {'description': description.strip(), 'status': status, 'created_at': datetime.utcnow()}
+    try:
+        created_at = datetime.fromisoformat(created_at)
+    except (TypeError, ValueError):
+        raise ValueError(f"record {line}: bad created_at '{created_at}'")
+    return {'description': description.strip(), 'status': status, 'created_at': created_at}
+
+def format_row(row):
+    created = row.created_at.strftime('%Y-%m-%d %H:%M') if row.created_at else ''
+    return f'#{row.id:<7} {row.status.upper():<6} {created}  {row.description}'
+
+def cmd_list(args, Session):
+    for count, row in enumerate(stream_tasks(Session, args.status)):
+        if args.limit and count >= args.limit:
+            break
+        print(format_row(row))
+
+def cmd_add(args, Session):
+    repo = TaskRepository(Session)
+    try:
+        task = repo.create(args.description, args.status)
+    finally:
+        repo.close()
+    print(f'Created task #{task.id} in {task.status.upper()}')
+
+def cmd_move(args, Session):
+    repo = TaskRepository(Session)
+    try:
+        task = repo.move(args.id, args.status)
+    except LookupError:
+        raise SystemExit(f'Task #{args.id} not found')
+    finally:
+        repo.close()
+    print(f'Moved task #{task.id} to {task.status.upper()}')
+
+def cmd_delete(args, Session):
+    repo = TaskRepository(Session)
+    try:
+        repo.delete(args.id)
+    except LookupError:
+        raise SystemExit(f'Task #{args.id} not found')
+    finally:
+        repo.close()
+    print(f'Deleted task #{args.id}')
+
+def cmd_import(args, Session):
+    fmt = file_format(args.file, args.format)
+    with open_file(args.file, 'r') as f:
+        rows = (task_values(record, line) for line, record in enumerate(read_rows(f, fmt), 1))
+        try:
+            imported = insert_many(Session, rows, args.batch)
+        except ValueError as e:
+            raise SystemExit(f'Import stopped: {e}; earlier batches were kept')
+    print(f'Imported {imported} tasks', file=sys.stderr)
+
+def cmd_export(args, Session):
+    fmt = file_format(args.file, args.format)
+    exported = 0
+    f = open_file(args.file, 'w')
+    try:
+        if fmt == 'csv':
+            writer = csv.writer(f)
+            writer.writerow(EXPORT_FIELDS)
+        for row in stream_tasks(Session, args.status, args.batch):
+            values = [row.id, row.description, row.status,
+                      row.created_at.isoformat() if row.created_at else None,
+                      row.updated_at.isoformat() if row.updated_at else None]
+            if fmt == 'csv':
+                writer.writerow(values)
+            else:
+                f.write(json.dumps(dict(zip(EXPORT_FIELDS, values))) + '\n')
+            exported += 1
+    finally:
+        if f is not sys.stdout:
+            f.close()
+    print(f'Exported {exported} tasks', file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage tasks from the command line')
+    parser.add_argument('--backend', default=None, choices=sorted(storage.BACKENDS),
+                        help='defaults to TODO_BACKEND')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    sub = commands.add_parser('list', help='print tasks in id order')
+    sub.add_argument('--status', choices=STATUSES)
+    sub.add_argument('--limit', type=int, default=0, help='stop after this many tasks')
+    sub.set_defaults(run=cmd_list)
+
+    sub = commands.add_parser('add', help='create a task')
+    sub.add_argument('description')
+    sub.add_argument('--status', choices=STATUSES, default='todo')
+    sub.set_defaults(run=cmd_add)
+
+    sub = commands.add_parser('move', help='change the status of a task')
+    sub.add_argument('id', type=int)
+    sub.add_argument('status', choices=STATUSES)
+    sub.set_defaults(run=cmd_move)
+
+    sub = commands.add_parser('delete', help='delete a task')
+    sub.add_argument('id', type=int)
+    sub.set_defaults(run=cmd_delete)
+
+    for name, run, help_text in [('import', cmd_import, "read tasks from a CSV or JSON Lines file, '-' for stdin"),
+                                 ('export', cmd_export, "write tasks to a CSV or JSON Lines file, '-' for stdout")]:
+        sub = commands.add_parser(name, help=help_text)
+        sub.add_argument('file')
+        sub.add_argument('--format', choices=['csv', 'jsonl'], help='defaults to the file extension')
+        sub.add_argument('--batch', type=int, default=storage.IMPORT_BATCH, help='rows per database round-trip')
+        if name == 'export':
+            sub.add_argument('--status', choices=STATUSES)
+        sub.set_defaults(run=run)
+
+    args = parser.parse_args()
+    if args.command in ('import', 'export') and args.file == '-' and not args.format:
+        parser.error('--format is required when reading stdin or writing stdout')
+
+    Session = init_db(storage.get_backend(args.backend))
+    try:
+        args.run(args, Session)
+    finally:
+        Session.kw['bind'].dispose()
+
+if __name__ == '__main__':
+    main()
@@ -1,508 +1,1811 @@
-import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
-from datetime import datetime
-import sqlalchemy as sa
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-import pymysql
-
-# ---------- CONFIG ----------
-MYSQL_USER = "root"
-MYSQL_PASSWORD = ""    
-MYSQL_HOST = "localhost"
-MYSQL_PORT = 3306
-DB_NAME = "todo_db"
-
-CONN_URL_DB = f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{DB_NAME}?charset=utf8mb4"
-CONN_URL_SERVER = f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/?charset=utf8mb4"
-
-# Color Scheme
-COLORS = {
-    'bg_main': '#1a1a2e',
-    'bg_secondary': '#16213e',
-    'bg_card': '#0f3460',
-    'accent': '#e94560',
-    'text_primary': '#ffffff',
-    'text_secondary': '#b3b3b3',
-    'priority_high': '#ff4757',
-    'priority_medium': '#ffa502',
-    'priority_low': '#2ed573',
-    'column_todo': '#3742fa',
-    'column_doing': '#ffa502',
-    'column_done': '#2ed573',
-    'hover': '#2f3542',
-    'delete_btn': '#e74c3c',
-    'delete_btn_hover': '#c0392b'
-}
-
-Base = declarative_base()
-
-class Task(Base):
-    __tablename__ = "tasks"
-    id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
-    description = sa.Column(sa.String(1024), nullable=False)
-    status = sa.Column(sa.String(20), default='todo')  
-    created_at = sa.Column(sa.DateTime, default=datetime.utcnow)
-
-def ensure_database_exists():
-    try:
-        conn = pymysql.connect(host=MYSQL_HOST, user=MYSQL_USER, password=MYSQL_PASSWORD, port=MYSQL_PORT)
-        with conn.cursor() as cur:
-            cur.execute(f"CREATE DATABASE IF NOT EXISTS `{DB_NAME}` DEFAULT CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci;")
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        raise RuntimeError(f"Cannot create/access MySQL database: {e}")
-
-def init_db():
-    ensure_database_exists()
-    engine = sa.create_engine(CONN_URL_DB, echo=False, future=True)
-    
-    try:
-        with engine.connect() as conn:
-            result = conn.execute(sa.text("SHOW COLUMNS FROM tasks LIKE 'status'"))
-            if not result.fetchone():
-                conn.execute(sa.text("ALTER TABLE tasks ADD COLUMN status VARCHAR(20) DEFAULT 'todo'"))
-                conn.execute(sa.text("UPDATE tasks SET status = 'done' WHERE done = 1"))
-                conn.execute(sa.text("UPDATE tasks SET status = 'todo' WHERE done = 0"))
-                conn.commit()
-    except:
-        pass  
-    
-    Base.metadata.create_all(engine)
-    Session = sessionmaker(bind=engine)
-    return Session
-
-class TaskCard(tk.Frame):
-    def __init__(self, parent, task, app):
-        super().__init__(parent, bg=COLORS['bg_card'], relief='flat', bd=0)
-        self.task = task
-        self.app = app
-        self.pack(fill='x', padx=5, pady=6)  
-        
-        self.configure(cursor='hand2')
-        
-        main_frame = tk.Frame(self, bg=COLORS['bg_card'])
-        main_frame.pack(fill='both', expand=True, padx=12, pady=12)
-        
-        status_map = {'todo': 'TO-DO', 'doing': 'DOING', 'done': 'DONE'}
-        status_color_map = {'todo': COLORS['column_todo'], 'doing': COLORS['column_doing'], 'done': COLORS['column_done']}
-        
-        status_frame = tk.Frame(main_frame, bg=COLORS['bg_card'])
-        status_frame.pack(fill='x', pady=(0, 4))
-        
-        status_label = tk.Label(status_frame, text=status_map[self.task.status],
-                               fg=status_color_map[self.task.status], bg=COLORS['bg_card'],
-                               font=('Segoe UI', 8, 'bold'))
-        status_label.pack(side='left')
-        
-        id_label = tk.Label(status_frame, text=f'#{self.task.id}',
-                           fg=COLORS['text_secondary'], bg=COLORS['bg_card'],
-                           font=('Segoe UI', 8))
-        id_label.pack(side='right')
-        
-        desc_label = tk.Label(main_frame, text=task.description,
-                             fg=COLORS['text_primary'], bg=COLORS['bg_card'],
-                             font=('Segoe UI', 12), wraplength=400, justify='left')  # Increased wraplength for wider text area
-        desc_label.pack(fill='x', pady=(0, 4))
-        
-        bottom_frame = tk.Frame(main_frame, bg=COLORS['bg_card'])
-        bottom_frame.pack(fill='x')
-        
-        date_str = task.created_at.strftime('%m/%d %H:%M')
-        date_label = tk.Label(bottom_frame, text=date_str,
-                             fg=COLORS['text_secondary'], bg=COLORS['bg_card'],
-                             font=('Segoe UI', 9))
-        date_label.pack(side='left')
-        
-        delete_btn = tk.Button(bottom_frame, text='🗑', command=self.delete_task,
-                              bg=COLORS['delete_btn'], fg='white',
-                              font=('Segoe UI', 8), bd=0, width=3,
-                              cursor='hand2', relief='flat')
-        delete_btn.pack(side='right')
-        
-        def on_delete_hover(event, hover_color=COLORS['delete_btn_hover']):
-            delete_btn.configure(bg=hover_color)
-        def on_delete_leave(event):
-            delete_btn.configure(bg=COLORS['delete_btn'])
-        
-        delete_btn.bind('<Enter>', on_delete_hover)
-        delete_btn.bind('<Leave>', on_delete_leave)
-        
-        self.bind_drag_events()
-        
-    def bind_drag_events(self):
-        widgets = [self] + list(self.winfo_children()) + [child for frame in self.winfo_children() 
-                                                         if isinstance(frame, tk.Frame) 
-                                                         for child in frame.winfo_children()]
-        
-        for widget in widgets:
-            if not isinstance(widget, tk.Button):  
-                widget.bind('<Button-1>', self.on_click)
-                widget.bind('<B1-Motion>', self.on_drag)
-                widget.bind('<ButtonRelease-1>', self.on_drop)
-            widget.bind('<Enter>', self.on_hover)
-            widget.bind('<Leave>', self.on_leave)
-    
-    def on_hover(self, event):
-        self.configure(bg=COLORS['hover'])
-        for child in self.winfo_children():
-            child.configure(bg=COLORS['hover'])
-            if isinstance(child, tk.Frame):
-                for grandchild in child.winfo_children():
-                    if not isinstance(grandchild, tk.Button):  
-                        grandchild.configure(bg=COLORS['hover'])
-    
-    def on_leave(self, event):
-        self.configure(bg=COLORS['bg_card'])
-        for child in self.winfo_children():
-            child.configure(bg=COLORS['bg_card'])
-            if isinstance(child, tk.Frame):
-                for grandchild in child.winfo_children():
-                    if not isinstance(grandchild, tk.Button):  
-                        grandchild.configure(bg=COLORS['bg_card'])
-    
-    def on_click(self, event):
-        self.start_x = event.x_root
-        self.start_y = event.y_root
-        self.lift()
-        
-    def on_drag(self, event):
-        x = self.winfo_x() + (event.x_root - self.start_x)
-        y = self.winfo_y() + (event.y_root - self.start_y)
-        self.place(x=x, y=y)
-        
-    def on_drop(self, event):
-        root_x = event.x_root
-        target_column = None
-        
-        for col_name, column in self.app.columns.items():
-            col_x = column.winfo_rootx()
-            col_width = column.winfo_width()
-            if col_x <= root_x <= col_x + col_width:
-                target_column = col_name
-                break
-        
-        if target_column and target_column != self.task.status:
-            self.app.move_task(self.task.id, target_column)
-        
-        self.pack(fill='x', padx=5, pady=6)
-    
-    def delete_task(self):
-        if messagebox.askyesno('Confirm Delete', f'Are you sure you want to delete task #{self.task.id}?'):
-            self.app.delete_task(self.task.id)
-
-class KanbanColumn(tk.Frame):
-    def __init__(self, parent, title, color, status):
-        super().__init__(parent, bg=COLORS['bg_secondary'], relief='flat', bd=0)
-        self.status = status
-        self.tasks = []
-        
-        header = tk.Frame(self, bg=color, height=60)
-        header.pack(fill='x', padx=2, pady=(2, 0))
-        header.pack_propagate(False)
-        
-        title_label = tk.Label(header, text=title, fg=COLORS['text_primary'],
-                              bg=color, font=('Segoe UI', 14, 'bold'))
-        title_label.pack(expand=True)
-        
-        self.count_label = tk.Label(header, text='0', fg=COLORS['text_primary'],
-                                   bg=color, font=('Segoe UI', 10))
-        self.count_label.pack(side='bottom', pady=(0, 8))
-        
-        self.canvas = tk.Canvas(self, bg=COLORS['bg_secondary'], highlightthickness=0)
-        scrollbar = ttk.Scrollbar(self, orient='vertical', command=self.canvas.yview)
-        self.scrollable_frame = tk.Frame(self.canvas, bg=COLORS['bg_secondary'])
-        
-        self.scrollable_frame.bind('<Configure>', 
-                                  lambda e: self.canvas.configure(scrollregion=self.canvas.bbox('all')))
-        
-        self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor='nw')
-        self.canvas.configure(yscrollcommand=scrollbar.set)
-        
-        self.canvas.pack(side='left', fill='both', expand=True, padx=(2, 0), pady=(0, 2))
-        scrollbar.pack(side='right', fill='y', padx=(0, 2), pady=(0, 2))
-        
-        self.canvas.bind('<MouseWheel>', self._on_mousewheel)
-        
-    def _on_mousewheel(self, event):
-        self.canvas.yview_scroll(int(-1 * (event.delta / 120)), 'units')
-        
-    def add_task_card(self, task, app):
-        card = TaskCard(self.scrollable_frame, task, app)
-        self.tasks.append(card)
-        self.update_count()
-        
-    def clear_tasks(self):
-        for card in self.tasks:
-            card.destroy()
-        self.tasks = []
-        self.update_count()
-        
-    def update_count(self):
-        self.count_label.configure(text=str(len(self.tasks)))
-
-class TodoApp(tk.Tk):
-    def __init__(self, Session):
-        super().__init__()
-        self.title('To-Do List')
-        self.geometry('1400x800')
-        self.configure(bg=COLORS['bg_main'])
-        self.session_factory = Session
-        
-        self.grid_rowconfigure(1, weight=1)
-        self.grid_columnconfigure(0, weight=1)
-        self.grid_columnconfigure(1, weight=1)
-        self.grid_columnconfigure(2, weight=1)
-        
-        self.setup_ui()
-        self.refresh_tasks()
-        
-    def setup_ui(self):
-        header = tk.Frame(self, bg=COLORS['accent'], height=80)
-        header.grid(row=0, column=0, columnspan=3, sticky='ew', padx=8, pady=(8, 0))
-        header.grid_propagate(False)
-        
-        title_label = tk.Label(header, text='To-Do List',
-                              fg=COLORS['text_primary'], bg=COLORS['accent'],
-                              font=('Segoe UI', 20, 'bold'))
-        title_label.pack(side='left', padx=20, pady=20)
-        
-        btn_frame = tk.Frame(header, bg=COLORS['accent'])
-        btn_frame.pack(side='right', padx=20, pady=10)
-        
-        add_btn = tk.Button(btn_frame, text='+ Add Task', command=self.add_task,
-                           bg=COLORS['bg_main'], fg=COLORS['text_primary'],
-                           font=('Segoe UI', 11, 'bold'), bd=0, padx=16, pady=8,
-                           cursor='hand2', relief='flat')
-        add_btn.pack(side='left', padx=(0, 8))
-        
-        refresh_btn = tk.Button(btn_frame, text='🔄 Refresh', command=self.refresh_tasks,
-                               bg=COLORS['bg_secondary'], fg=COLORS['text_primary'],
-                               font=('Segoe UI', 11), bd=0, padx=16, pady=8,
-                               cursor='hand2', relief='flat')
-        refresh_btn.pack(side='left')
-        
-        self.columns = {}
-        
-        # To-Do Column
-        self.columns['todo'] = KanbanColumn(self, 'TO-DO', COLORS['column_todo'], 'todo')
-        self.columns['todo'].grid(row=1, column=0, sticky='nsew', padx=(8, 4), pady=8)
-        
-        # Doing Column
-        self.columns['doing'] = KanbanColumn(self, 'DOING', COLORS['column_doing'], 'doing')
-        self.columns['doing'].grid(row=1, column=1, sticky='nsew', padx=4, pady=8)
-        
-        # Done Column
-        self.columns['done'] = KanbanColumn(self, 'DONE', COLORS['column_done'], 'done')
-        self.columns['done'].grid(row=1, column=2, sticky='nsew', padx=(4, 8), pady=8)
-        
-        # Status bar
-        self.status_var = tk.StringVar()
-        self.status_var.set('Ready')
-        status_bar = tk.Label(self, textvariable=self.status_var,
-                             bg=COLORS['bg_secondary'], fg=COLORS['text_secondary'],
-                             font=('Segoe UI', 9), anchor='w', padx=10)
-        status_bar.grid(row=2, column=0, columnspan=3, sticky='ew', padx=8, pady=(0, 8))
-        
-    def add_task(self):
-        task_dialog = tk.Toplevel(self)
-        task_dialog.title('Create New Task')
-        task_dialog.geometry('600x450')
-        task_dialog.configure(bg='#f8f9fa')
-        task_dialog.resizable(False, False)
-        
-        task_dialog.transient(self)
-        task_dialog.grab_set()
-        
-        selected_status = tk.StringVar(value='todo')
-        
-        header_frame = tk.Frame(task_dialog, bg='#4a90e2', height=70)
-        header_frame.pack(fill='x', pady=(0, 25))
-        header_frame.pack_propagate(False)
-        
-        tk.Label(header_frame, text='📝 Create New Task',
-                fg='white', bg='#4a90e2',
-                font=('Segoe UI', 18, 'bold')).pack(expand=True)
-        
-        content_frame = tk.Frame(task_dialog, bg='#f8f9fa')
-        content_frame.pack(fill='both', expand=True, padx=35)
-        
-        tk.Label(content_frame, text='Task Description:',
-                fg='#2c3e50', bg='#f8f9fa',
-                font=('Segoe UI', 12, 'bold')).pack(anchor='w', pady=(0, 8))
-        
-        desc_frame = tk.Frame(content_frame, bg='white', relief='solid', bd=1)
-        desc_frame.pack(fill='x', pady=(0, 25))
-        
-        desc_text = tk.Text(desc_frame, height=6, font=('Segoe UI', 11),
-                           bg='white', fg='#2c3e50',
-                           relief='flat', bd=12, wrap='word',
-                           insertbackground='#4a90e2')
-        desc_text.pack(fill='both', expand=True)
-        
-        status_frame = tk.LabelFrame(content_frame, text=' Initial Status ',
-                                    fg='#2c3e50', bg='#f8f9fa',
-                                    font=('Segoe UI', 11, 'bold'), bd=1,
-                                    relief='solid')
-        status_frame.pack(fill='x', pady=(0, 25))
-        
-        status_inner = tk.Frame(status_frame, bg='#f8f9fa')
-        status_inner.pack(fill='x', padx=15, pady=10)
-        
-        statuses = [('todo', '📋 To-Do', '#3742fa'),
-                   ('doing', '⚡ Doing', '#ffa502'),
-                   ('done', '✅ Done', '#2ed573')]
-        
-        def update_status(value):
-            selected_status.set(value)
-        
-        for value, text, color in statuses:
-            cb_frame = tk.Frame(status_inner, bg='#f8f9fa')
-            cb_frame.pack(fill='x', pady=4)
-            
-            cb = tk.Radiobutton(cb_frame, text=text,
-                               variable=selected_status, value=value,
-                               fg=color, bg='#f8f9fa',
-                               selectcolor='white',
-                               font=('Segoe UI', 11, 'bold'), anchor='w',
-                               activebackground='#f8f9fa',
-                               activeforeground=color,
-                               command=lambda v=value: update_status(v))
-            cb.pack(side='left')
-        
-        # Buttons
-        btn_frame = tk.Frame(task_dialog, bg='#f8f9fa')
-        btn_frame.pack(pady=25)
-        
-        def create_task():
-            description = desc_text.get('1.0', 'end-1c').strip()
-            if not description:
-                messagebox.showwarning('Warning', 'Please enter a task description!')
-                return
-            
-            task_dialog.destroy()
-            self._create_task(description, selected_status.get())
-        
-        ok_btn = tk.Button(btn_frame, text='✓ OK', command=create_task,
-                          bg='#27ae60', fg='white',
-                          font=('Segoe UI', 12, 'bold'), bd=0, padx=30, pady=12,
-                          cursor='hand2', relief='flat')
-        ok_btn.pack(side='left', padx=8)
-        
-        cancel_btn = tk.Button(btn_frame, text='✕ Cancel', command=task_dialog.destroy,
-                              bg='#e74c3c', fg='white',
-                              font=('Segoe UI', 12, 'bold'), bd=0, padx=25, pady=12,
-                              cursor='hand2', relief='flat')
-        cancel_btn.pack(side='left', padx=8)
-        
-        def on_hover(btn, hover_color):
-            def enter(e):
-                btn.configure(bg=hover_color)
-            def leave(e):
-                original_colors = {'#219a52': '#27ae60', '#c0392b': '#e74c3c'}
-                btn.configure(bg=original_colors.get(hover_color, btn.cget('bg')))
-            return enter, leave
-        
-        ok_enter, ok_leave = on_hover(ok_btn, '#219a52')
-        ok_btn.bind('<Enter>', ok_enter)
-        ok_btn.bind('<Leave>', ok_leave)
-        
-        cancel_enter, cancel_leave = on_hover(cancel_btn, '#c0392b')
-        cancel_btn.bind('<Enter>', cancel_enter)
-        cancel_btn.bind('<Leave>', cancel_leave)
-        
-        task_dialog.bind('<Return>', lambda event: create_task())
-        
-        desc_text.focus_set()
-        
-    def _create_task(self, description, status):
-        session = self.session_factory()
-        try:
-            task = Task(description=description, status=status)
-            session.add(task)
-            session.commit()
-            status_text = {'todo': 'TO-DO', 'doing': 'DOING', 'done': 'DONE'}[status]
-            self.status_var.set(f'Task created in {status_text}: {description[:30]}...' if len(description) > 30 else f'Task created in {status_text}: {description}')
-            self.refresh_tasks()
-        except Exception as e:
-            session.rollback()
-            messagebox.showerror('Error', f'Failed to create task: {e}')
-        finally:
-            session.close()
-            
-    def move_task(self, task_id, new_status):
-        session = self.session_factory()
-        try:
-            task = session.get(Task, task_id)
-            if task:
-                old_status = task.status
-                task.status = new_status
-                session.commit()
-                self.status_var.set(f'Moved task #{task_id} from {old_status.upper()} to {new_status.upper()}')
-                self.refresh_tasks()
-            else:
-                messagebox.showerror('Error', 'Task not found')
-        except Exception as e:
-            session.rollback()
-            messagebox.showerror('Error', f'Failed to move task: {e}')
-        finally:
-            session.close()
-            
-    def delete_task(self, task_id):
-        session = self.session_factory()
-        try:
-            task = session.get(Task, task_id)
-            if task:
-                session.delete(task)
-                session.commit()
-                self.status_var.set(f'Deleted task #{task_id}')
-                self.refresh_tasks()
-            else:
-                messagebox.showerror('Error', 'Task not found')
-        except Exception as e:
-            session.rollback()
-            messagebox.showerror('Error', f'Failed to delete task: {e}')
-        finally:
-            session.close()
-            
-    def refresh_tasks(self):
-        for column in self.columns.values():
-            column.clear_tasks()
-            
-        session = self.session_factory()
-        try:
-            tasks = session.query(Task).order_by(Task.created_at).all()
-            
-            for task in tasks:
-                if task.status in self.columns:
-                    self.columns[task.status].add_task_card(task, self)
-                    
-            total_tasks = len(tasks)
-            self.status_var.set(f'Loaded {total_tasks} tasks')
-            
-        except Exception as e:
-            messagebox.showerror('Database Error', f'Failed to load tasks: {e}')
-        finally:
-            session.close()
-
-def main():
-    try:
-        Session = init_db()
-    except Exception as e:
-        messagebox.showerror('Database Error', f'Failed to initialize database:\n{e}')
-        return
-        
-    app = TodoApp(Session)
-    
-    def on_btn_hover(btn, hover_color):
-        def enter(e):
-            btn.configure(bg=hover_color)
-        def leave(e):
-            btn.configure(bg=btn.original_color)
-        return enter, leave
-    
-    app.mainloop()
-
-if __name__ == '__main__':
+import time
+STARTED = time.perf_counter()  # reference point for the startup timings
+import tkinter as tk
+from tkinter import ttk, messagebox, simpledialog
+import tkinter.font as tkfont
+import bisect
+import functools
+import importlib
+import json
+import os
+import queue
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from journal import Journal, flush
+from profiler import profiler
+from taskstore import STATUS_TEXT, TaskRecord, TaskStore
+
+# storage pulls in SQLAlchemy, which takes longer to import than the window
+# takes to appear, so it is imported on the DB thread once the window is up
+# (see TodoApp.open_storage)
+storage = None
+
+# ---------- CONFIG ----------
+# Database settings live in storage.py
+STARTUP_REPORT = os.environ.get('TODO_STARTUP_REPORT') == '1'  # print startup timings as JSON and exit
+API_SERVER = os.environ.get('TODO_API') == '1'  # also serve the board over HTTP, see api_server.py
+
+# Board rendering
+CARD_RENDERER = 'widget' # 'widget': a TaskCard per row, 'canvas': rows drawn on the column canvas
+VIRTUAL_COLUMNS = True   # only build cards for rows near the visible region (canvas cards always are)
+DESC_WRAP = 400          # wraplength of the card description, in pixels
+SEARCH_DEBOUNCE_MS = 250 # wait for typing to pause before querying
+LAYOUT_CACHE_SIZE = 4096 # wrapped descriptions kept per canvas column
+
+# Live sync
+SYNC_INTERVAL_MS = 2000  # how often to poll for other clients' changes, 0 turns it off
+FLUSH_DELAY_MS = 50      # wait this long after a write so quick bursts share a transaction
+FLUSH_RETRY_MS = 5000    # retry interval while the database is unreachable
+
+FRAME_MS = 16            # pointer motion is applied at most once per frame
+DRAG_THRESHOLD = 4       # pixels the pointer must travel before a press becomes a drag
+
+# Archive, the age limit itself is ARCHIVE_AFTER_DAYS in storage.py
+ARCHIVE_INTERVAL_MS = 3600000  # how often old done tasks are moved out of the board
+
+# Color Scheme
+COLORS = {
+    'bg_main': '#1a1a2e',
+    'bg_secondary': '#16213e',
+    'bg_card': '#0f3460',
+    'accent': '#e94560',
+    'text_primary': '#ffffff',
+    'text_secondary': '#b3b3b3',
+    'priority_high': '#ff4757',
+    'priority_medium': '#ffa502',
+    'priority_low': '#2ed573',
+    'column_todo': '#3742fa',
+    'column_doing': '#ffa502',
+    'column_done': '#2ed573',
+    'hover': '#2f3542',
+    'delete_btn': '#e74c3c',
+    'delete_btn_hover': '#c0392b',
+    'search_hit': '#9c5d00'
+}
+
+STATUS_COLORS = {'todo': COLORS['column_todo'], 'doing': COLORS['column_doing'], 'done': COLORS['column_done']}
+
+class DBExecutor:
+    # Runs database calls on one background thread, so writes keep their
+    # order, and hands the results back to the Tk thread through a queue
+    # polled with after().
+    POLL_MS = 16
+    
+    def __init__(self, root):
+        self.root = root
+        self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db')
+        self.results = queue.Queue()
+        self.root.after(self.POLL_MS, self._poll)
+        
+    def submit(self, fn, *args, on_success=None, on_error=None):
+        queued = time.perf_counter()
+        
+        def run():
+            if profiler.enabled:
+                profiler.record('db.queue_wait', time.perf_counter() - queued)
+            try:
+                result = fn(*args)
+            except Exception as e:
+                self.results.put((on_error, e))
+            else:
+                self.results.put((on_success, result))
+        self.pool.submit(run)
+        
+    def _poll(self):
+        try:
+            while True:
+                try:
+                    callback, value = self.results.get_nowait()
+                except queue.Empty:
+                    break
+                if callback:
+                    try:
+                        callback(value)
+                    except Exception:
+                        # Reported like any failing Tk callback; the rest
+                        # of the queue still gets delivered
+                        self.root.report_callback_exception(*sys.exc_info())
+        finally:
+            self.root.after(self.POLL_MS, self._poll)
+        
+    def shutdown(self):
+        self.pool.shutdown(wait=True)
+
+class TaskCard(tk.Frame):
+    def __init__(self, parent, task, app):
+        super().__init__(parent, bg=COLORS['bg_card'], relief='flat', bd=0,
+                         highlightthickness=2, highlightbackground=COLORS['bg_secondary'])
+        self.task = task
+        self.app = app
+        
+        self.configure(cursor='hand2')
+        
+        main_frame = tk.Frame(self, bg=COLORS['bg_card'])
+        main_frame.pack(fill='both', expand=True, padx=12, pady=12)
+        
+        status_frame = tk.Frame(main_frame, bg=COLORS['bg_card'])
+        status_frame.pack(fill='x', pady=(0, 4))
+        
+        self.status_label = tk.Label(status_frame, bg=COLORS['bg_card'],
+                                    font=('Segoe UI', 8, 'bold'))
+        self.status_label.pack(side='left')
+        
+        self.id_label = tk.Label(status_frame,
+                                fg=COLORS['text_secondary'], bg=COLORS['bg_card'],
+                                font=('Segoe UI', 8))
+        self.id_label.pack(side='right')
+        
+        self.desc_label = tk.Label(main_frame,
+                                  fg=COLORS['text_primary'], bg=COLORS['bg_card'],
+                                  font=('Segoe UI', 12), wraplength=DESC_WRAP, justify='left')  # Increased wraplength for wider text area
+        self.desc_label.pack(fill='x', pady=(0, 4))
+        
+        bottom_frame = tk.Frame(main_frame, bg=COLORS['bg_card'])
+        bottom_frame.pack(fill='x')
+        
+        self.date_label = tk.Label(bottom_frame,
+                                  fg=COLORS['text_secondary'], bg=COLORS['bg_card'],
+                                  font=('Segoe UI', 9))
+        self.date_label.pack(side='left')
+        
+        self.delete_btn = tk.Button(bottom_frame, text='🗑', command=self.delete_task,
+                                   bg=COLORS['delete_btn'], fg='white',
+                                   font=('Segoe UI', 8), bd=0, width=3,
+                                   cursor='hand2', relief='flat')
+        self.delete_btn.pack(side='right')
+        
+        # Hover and drag events are handled by the column (see KanbanColumn.adopt_card)
+        self.bg_widgets = [self, main_frame, status_frame, self.status_label, self.id_label,
+                           self.desc_label, bottom_frame, self.date_label]
+        self.widgets = self.bg_widgets + [self.delete_btn]
+        self.hovered = False
+        
+        self.bind_task(task)
+        
+    def bind_task(self, task):
+        # Cards are recycled by virtual columns, so everything task-specific is
+        # set here, from the strings the TaskRecord already holds
+        self.task = task
+        self.status_label.configure(text=task.status_text, fg=STATUS_COLORS[task.status])
+        self.id_label.configure(text=task.id_text)
+        self.desc_label.configure(text=task.description)
+        self.set_highlight(bool(self.app.search_query))
+        self.date_label.configure(text=task.date_text)
+        self.set_selected(task.id in self.app.selection)
+        
+    def set_highlight(self, highlight):
+        # While a search is active every card on the board is a hit
+        self.desc_label.configure(fg=COLORS['priority_medium'] if highlight else COLORS['text_primary'])
+        
+    def set_selected(self, selected):
+        color = COLORS['accent'] if selected else COLORS['bg_secondary']
+        self.configure(highlightbackground=color, highlightcolor=color)
+        
+    def set_hover(self, hovered):
+        if hovered == self.hovered:
+            return
+        self.hovered = hovered
+        bg = COLORS['hover'] if hovered else COLORS['bg_card']
+        for widget in self.bg_widgets:
+            widget.configure(bg=bg)
+    
+    def delete_task(self):
+        if messagebox.askyesno('Confirm Delete', f'Are you sure you want to delete task #{self.task.id}?'):
+            self.app.delete_task(self.task.id)
+
+class DragGhost(tk.Toplevel):
+    # Borderless window that follows the pointer while cards are dragged,
+    # so the real card never moves and its column never re-lays out
+    WIDTH = 260
+    HEIGHT = 60
+    OFFSET = 12  # keep the ghost off the pointer so drops hit the column below
+    
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.withdraw()
+        self.overrideredirect(True)
+        try:
+            self.attributes('-alpha', 0.85)
+        except tk.TclError:
+            pass
+        
+        self.canvas = tk.Canvas(self, width=self.WIDTH, height=self.HEIGHT, bg=COLORS['hover'],
+                                highlightthickness=2, highlightbackground=COLORS['accent'])
+        self.canvas.pack()
+        self.title_item = self.canvas.create_text(10, 8, anchor='nw', fill=COLORS['text_secondary'],
+                                                  font=('Segoe UI', 8, 'bold'))
+        self.text_item = self.canvas.create_text(10, 26, anchor='nw', fill=COLORS['text_primary'],
+                                                 font=('Segoe UI', 11))
+        
+    def show(self, task, count, x, y):
+        text = task.description.split('\n', 1)[0]
+        if len(text) > 34:
+            text = text[:33] + '…'
+        self.canvas.itemconfigure(self.title_item, text=f'#{task.id}' if count == 1 else f'{count} TASKS')
+        self.canvas.itemconfigure(self.text_item, text=text)
+        self.move_to(x, y)
+        self.deiconify()
+        self.lift()
+        
+    def move_to(self, x, y):
+        self.geometry(f'+{x + self.OFFSET}+{y + self.OFFSET}')
+        
+    def hide(self):
+        self.withdraw()
+
+class TextLayout:
+    # Word-wraps text to a pixel width the way a Label's wraplength does.
+    # Wrapped lines are cached per (text, width) and word widths per word.
+    def __init__(self, font, size=LAYOUT_CACHE_SIZE):
+        self.font = font
+        self.space = font.measure(' ')
+        self.line_height = font.metrics('linespace')
+        self.measure = functools.lru_cache(maxsize=size * 4)(font.measure)
+        self.wrap = functools.lru_cache(maxsize=size)(self._wrap)
+        
+    def _wrap(self, text, width):
+        lines = []
+        for paragraph in text.split('\n'):
+            line, line_width = '', 0
+            for word in paragraph.split(' '):
+                word_width = self.measure(word)
+                if line and line_width + self.space + word_width > width:
+                    lines.append(line)
+                    line, line_width = '', 0
+                while word_width > width and len(word) > 1:
+                    cut = self._fit(word, width)
+                    lines.append(word[:cut])
+                    word = word[cut:]
+                    word_width = self.measure(word)
+                if line:
+                    line += ' ' + word
+                    line_width += self.space + word_width
+                else:
+                    line, line_width = word, word_width
+            lines.append(line)
+        return tuple(lines)
+        
+    def _fit(self, word, width):
+        # Longest prefix of an over-long word that still fits, at least one character
+        low, high = 1, len(word) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.font.measure(word[:middle]) <= width:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+class CanvasCard:
+    # A task card drawn as items on its column's canvas instead of a tree of
+    # widgets. It offers the same bind_task/set_* methods as TaskCard, so the
+    # app does not care which renderer a column uses.
+    INSET = 14  # 2px border + 12px padding, as in TaskCard
+    DELETE_W = 28
+    DELETE_H = 20
+    
+    def __init__(self, column, task, app):
+        self.column = column
+        self.canvas = canvas = column.canvas
+        self.app = app
+        self.tag = f'card{id(self)}'
+        self.y = 0
+        self.width = 0
+        self.height = 0
+        self.lines = ()
+        self.hits = []
+        self.hovered = False
+        self.shown = True
+        
+        body = ('card', 'cardbody', self.tag)
+        button = ('card', 'carddelete', self.tag)
+        self.box = canvas.create_rectangle(0, 0, 0, 0, fill=COLORS['bg_card'],
+                                           outline=COLORS['bg_secondary'], width=2, tags=body)
+        self.status_item = canvas.create_text(0, 0, anchor='nw', font=column.status_font, tags=body)
+        self.id_item = canvas.create_text(0, 0, anchor='ne', fill=COLORS['text_secondary'],
+                                          font=column.small_font, tags=body)
+        self.desc_item = canvas.create_text(0, 0, anchor='nw', fill=COLORS['text_primary'],
+                                            font=column.desc_font, tags=body)
+        self.date_item = canvas.create_text(0, 0, anchor='w', fill=COLORS['text_secondary'],
+                                            font=column.date_font, tags=body)
+        self.delete_box = canvas.create_rectangle(0, 0, 0, 0, fill=COLORS['delete_btn'],
+                                                  outline='', tags=button)
+        self.delete_item = canvas.create_text(0, 0, text='🗑', fill='white',
+                                              font=column.small_font, tags=button)
+        
+        self.bind_task(task)
+        
+    def bind_task(self, task):
+        old = getattr(self, 'task', None)
+        self.task = task
+        self.canvas.itemconfigure(self.status_item, text=task.status_text, fill=STATUS_COLORS[task.status])
+        self.canvas.itemconfigure(self.id_item, text=task.id_text)
+        self.canvas.itemconfigure(self.date_item, text=task.date_text)
+        self.set_selected(task.id in self.app.selection)
+        if old is None or old.description != task.description:
+            self.width = 0  # force a full redraw on the next place()
+        else:
+            self.set_highlight(bool(self.app.search_query))
+            
+    def place(self, y, width):
+        if width == self.width:
+            if y != self.y:
+                self.canvas.move(self.tag, 0, y - self.y)
+                self.y = y
+            return
+        self.y = y
+        self.width = width
+        self.draw()
+        
+    def draw(self):
+        canvas = self.canvas
+        column = self.column
+        left = column.PADX
+        right = left + self.width
+        inset = self.INSET
+        
+        top = self.y + inset
+        canvas.coords(self.status_item, left + inset, top)
+        canvas.coords(self.id_item, right - inset, top)
+        
+        desc_y = top + column.header_height + 4
+        self.lines = column.text_layout.wrap(self.task.description, column.wrap_width(self.width))
+        canvas.itemconfigure(self.desc_item, text='\n'.join(self.lines))
+        canvas.coords(self.desc_item, left + inset, desc_y)
+        
+        bottom_y = desc_y + len(self.lines) * column.text_layout.line_height + 4
+        bottom_height = max(column.date_height, self.DELETE_H)
+        canvas.coords(self.date_item, left + inset, bottom_y + bottom_height / 2)
+        canvas.coords(self.delete_box, right - inset - self.DELETE_W, bottom_y,
+                      right - inset, bottom_y + self.DELETE_H)
+        canvas.coords(self.delete_item, right - inset - self.DELETE_W / 2, bottom_y + self.DELETE_H / 2)
+        
+        self.height = bottom_y + bottom_height + inset - self.y
+        canvas.coords(self.box, left + 1, self.y + 1, right - 1, self.y + self.height - 1)
+        self.set_highlight(bool(self.app.search_query))
+        
+    def set_highlight(self, highlight):
+        # Mark each word of the description that a search term is a prefix of
+        if self.hits:
+            self.canvas.delete(*self.hits)
+            self.hits = []
+        terms = tuple(re.findall(r'\w+', self.app.search_query.lower())) if highlight else ()
+        if not terms or not self.width:
+            return
+        
+        font = self.column.desc_font
+        line_height = self.column.text_layout.line_height
+        x, y = self.canvas.coords(self.desc_item)
+        state = 'normal' if self.shown else 'hidden'
+        for row, line in enumerate(self.lines):
+            for match in re.finditer(r'\w+', line):
+                if not match.group().lower().startswith(terms):
+                    continue
+                start = x + font.measure(line[:match.start()])
+                end = start + font.measure(match.group())
+                hit = self.canvas.create_rectangle(start - 1, y + row * line_height, end + 1,
+                                                   y + (row + 1) * line_height, fill=COLORS['search_hit'],
+                                                   outline='', state=state, tags=('card', 'cardbody', self.tag))
+                self.canvas.tag_lower(hit, self.desc_item)
+                self.hits.append(hit)
+                
+    def set_selected(self, selected):
+        color = COLORS['accent'] if selected else COLORS['bg_secondary']
+        self.canvas.itemconfigure(self.box, outline=color)
+        
+    def set_hover(self, hovered):
+        if hovered == self.hovered:
+            return
+        self.hovered = hovered
+        self.canvas.itemconfigure(self.box, fill=COLORS['hover'] if hovered else COLORS['bg_card'])
+        
+    def set_delete_hover(self, hovered):
+        self.canvas.itemconfigure(self.delete_box, fill=COLORS['delete_btn_hover'] if hovered else COLORS['delete_btn'])
+        
+    def show(self, shown):
+        self.shown = shown
+        self.canvas.itemconfigure(self.tag, state='normal' if shown else 'hidden')
+        
+    def delete_task(self):
+        if messagebox.askyesno('Confirm Delete', f'Are you sure you want to delete task #{self.task.id}?'):
+            self.app.delete_task(self.task.id)
+
+class KanbanColumn(tk.Frame):
+    def __init__(self, parent, title, color, status):
+        super().__init__(parent, bg=COLORS['bg_secondary'], relief='flat', bd=0)
+        self.status = status
+        self.tasks = {}
+        self.cards = {}
+        self.order = []
+        self.total = 0
+        self.exhausted = False
+        self.loading = False
+        self.on_scroll_end = None
+        
+        header = tk.Frame(self, bg=color, height=60)
+        header.pack(fill='x', padx=2, pady=(2, 0))
+        header.pack_propagate(False)
+        
+        title_label = tk.Label(header, text=title, fg=COLORS['text_primary'],
+                              bg=color, font=('Segoe UI', 14, 'bold'))
+        title_label.pack(expand=True)
+        
+        self.count_label = tk.Label(header, text='0', fg=COLORS['text_primary'],
+                                   bg=color, font=('Segoe UI', 10))
+        self.count_label.pack(side='bottom', pady=(0, 8))
+        
+        menu_btn = tk.Menubutton(header, text='⋯', fg=COLORS['text_primary'], bg=color,
+                                 activebackground=color, font=('Segoe UI', 12, 'bold'),
+                                 bd=0, relief='flat', cursor='hand2')
+        menu_btn.place(relx=1.0, x=-8, y=4, anchor='ne')
+        self.menu = tk.Menu(menu_btn, tearoff=0)
+        menu_btn.configure(menu=self.menu)
+        
+        self.canvas = tk.Canvas(self, bg=COLORS['bg_secondary'], highlightthickness=0)
+        self.scrollbar = ttk.Scrollbar(self, orient='vertical', command=self.canvas.yview)
+        self.build_content()
+        
+        self.canvas.pack(side='left', fill='both', expand=True, padx=(2, 0), pady=(0, 2))
+        self.scrollbar.pack(side='right', fill='y', padx=(0, 2), pady=(0, 2))
+        
+        self.canvas.bind('<MouseWheel>', self._on_mousewheel)
+        
+        # Card events are bound once per column on a bindtag shared by every
+        # widget of its cards instead of on each widget
+        self.card_tag = f'TaskCard.{status}'
+        self.card_of = {}  # widget path -> TaskCard
+        self.hover_card = None
+        self.hover_check = None
+        self.drag = None
+        self.drag_job = None
+        self.bind_class(self.card_tag, '<Enter>', self._on_card_enter)
+        self.bind_class(self.card_tag, '<Leave>', self._on_card_leave)
+        self.bind_class(self.card_tag, '<Button-1>', self._on_card_press)
+        self.bind_class(self.card_tag, '<Control-Button-1>', self._on_card_toggle)
+        self.bind_class(self.card_tag, '<B1-Motion>', self._on_card_motion)
+        self.bind_class(self.card_tag, '<ButtonRelease-1>', self._on_card_release)
+        
+    def build_content(self):
+        self.scrollable_frame = tk.Frame(self.canvas, bg=COLORS['bg_secondary'])
+        
+        self.scrollable_frame.bind('<Configure>', 
+                                  lambda e: self.canvas.configure(scrollregion=self.canvas.bbox('all')))
+        
+        self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor='nw')
+        self.canvas.configure(yscrollcommand=self._on_scroll)
+        
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if float(last) >= 0.9:
+            self.request_more()
+            
+    def request_more(self):
+        if self.exhausted or self.loading or not self.on_scroll_end:
+            return
+        self.loading = True
+        self.after_idle(self.on_scroll_end, self.status)
+        
+    def _on_mousewheel(self, event):
+        self.canvas.yview_scroll(int(-1 * (event.delta / 120)), 'units')
+        
+    @staticmethod
+    def sort_key(task):
+        return task.sort_key
+        
+    def reorder(self, old, task):
+        # An update can carry a different created_at than the record it
+        # replaces (the database's copy of one the board created), move its
+        # key in `order`; returns whether it moved
+        if self.sort_key(old) == self.sort_key(task):
+            return False
+        del self.order[bisect.bisect_left(self.order, self.sort_key(old))]
+        bisect.insort(self.order, self.sort_key(task))
+        return True
+        
+    def add_task_card(self, task, app):
+        old = self.tasks.get(task.id)
+        if old is not None:
+            self.tasks[task.id] = task
+            card = self.cards[task.id]
+            card.bind_task(task)
+            if self.reorder(old, task):
+                self.pack_card(card)
+            return
+        
+        self.tasks[task.id] = task
+        bisect.insort(self.order, self.sort_key(task))
+        card = TaskCard(self.scrollable_frame, task, app)
+        self.adopt_card(card)
+        self.cards[task.id] = card
+        self.pack_card(card)
+        self.update_count()
+        
+    def remove_task_card(self, task_id):
+        task = self.tasks.pop(task_id, None)
+        if task is None:
+            return
+        del self.order[bisect.bisect_left(self.order, self.sort_key(task))]
+        card = self.cards.pop(task_id)
+        self.forget_card(card)
+        card.destroy()
+        self.update_count()
+        
+    def covers(self, task):
+        # Whether the task falls inside the range of rows loaded so far
+        if self.exhausted:
+            return True
+        return bool(self.order) and self.sort_key(task) <= self.order[-1]
+        
+    def pack_card(self, card):
+        # Keep packing order in sync with created_at order
+        index = bisect.bisect(self.order, self.sort_key(card.task))
+        if index < len(self.order):
+            card.pack(fill='x', padx=5, pady=6, before=self.cards[self.order[index][1]])
+        elif index > 1:
+            # After the previous card, not just last: a repacked card keeps its slot otherwise
+            card.pack(fill='x', padx=5, pady=6, after=self.cards[self.order[index - 2][1]])
+        else:
+            card.pack(fill='x', padx=5, pady=6)
+        
+    def clear_tasks(self):
+        for card in self.cards.values():
+            self.forget_card(card)
+            card.destroy()
+        self.tasks = {}
+        self.cards = {}
+        self.order = []
+        self.update_count()
+        
+    def set_total(self, total):
+        self.total = max(0, total)
+        self.update_count()
+        
+    def update_count(self):
+        self.count_label.configure(text=str(self.total))
+        
+    def adopt_card(self, card):
+        for widget in card.widgets:
+            widget.bindtags((self.card_tag,) + widget.bindtags())
+            self.card_of[str(widget)] = card
+            
+    def detach_card(self, card):
+        # The card is being hidden or recycled, drop any hover or drag on it
+        self.cancel_drag(card)
+        if card is self.hover_card:
+            self.set_hover_card(None)
+            
+    def forget_card(self, card):
+        self.detach_card(card)
+        for widget in card.widgets:
+            self.card_of.pop(str(widget), None)
+            
+    def set_hover_card(self, card):
+        if card is not self.hover_card:
+            if self.hover_card:
+                self.hover_card.set_hover(False)
+            self.hover_card = card
+            if card:
+                card.set_hover(True)
+                
+    @profiler.timed('ui.on_hover')
+    def _on_card_enter(self, event):
+        if isinstance(event.widget, tk.Button):
+            event.widget.configure(bg=COLORS['delete_btn_hover'])
+        self.set_hover_card(self.card_of.get(str(event.widget)))
+        
+    def _on_card_leave(self, event):
+        if isinstance(event.widget, tk.Button):
+            event.widget.configure(bg=COLORS['delete_btn'])
+        # Crossing between widgets of one card fires Leave then Enter, so
+        # only decide whether the card lost the pointer once both are in
+        if self.hover_check is None:
+            self.hover_check = self.after_idle(self._check_hover)
+            
+    def _check_hover(self):
+        self.hover_check = None
+        try:
+            widget = self.winfo_containing(*self.winfo_pointerxy())
+        except KeyError:  # pointer over a widget tkinter has no wrapper for
+            widget = None
+        self.set_hover_card(self.card_of.get(str(widget)) if widget else None)
+        
+    def card_at(self, event):
+        # The card a press landed on, None for its delete button
+        if isinstance(event.widget, tk.Button):
+            return None
+        return self.card_of.get(str(event.widget))
+        
+    @profiler.timed('ui.on_click')
+    def _on_card_press(self, event):
+        card = self.card_at(event)
+        if card is None:
+            return
+        if card.task.id not in card.app.selection:
+            card.app.clear_selection()
+        self.start_drag(card, event)
+        
+    @profiler.timed('ui.on_toggle_select')
+    def _on_card_toggle(self, event):
+        card = self.card_at(event)
+        if card is None:
+            return
+        card.app.toggle_selection(card.task.id)
+        self.start_drag(card, event)
+        
+    def start_drag(self, card, event):
+        self.drag = {'card': card, 'task': card.task, 'app': card.app, 'active': False,
+                     'start': (event.x_root, event.y_root), 'pointer': (event.x_root, event.y_root)}
+        
+    def _on_card_motion(self, event):
+        # Only remember the pointer here, the ghost catches up once per frame
+        if self.drag is None:
+            return
+        self.drag['pointer'] = (event.x_root, event.y_root)
+        if self.drag_job is None:
+            self.drag_job = self.after(FRAME_MS, self._drag_frame)
+            
+    @profiler.timed('ui.on_drag')
+    def _drag_frame(self):
+        self.drag_job = None
+        drag = self.drag
+        if drag is None:
+            return
+        x, y = drag['pointer']
+        if drag['active']:
+            drag['app'].ghost.move_to(x, y)
+            return
+        start_x, start_y = drag['start']
+        if abs(x - start_x) + abs(y - start_y) >= DRAG_THRESHOLD:
+            drag['active'] = True
+            app = drag['app']
+            task = drag['task']
+            count = len(app.selection) if task.id in app.selection else 1
+            app.ghost.show(task, count, x, y)
+            
+    @profiler.timed('ui.on_drop')
+    def _on_card_release(self, event):
+        drag = self.drag
+        self.cancel_drag()
+        if drag is None or not drag['active']:
+            return
+        app = drag['app']
+        task = drag['task']
+        target_column = app.column_at(event.x_root)
+        if target_column and target_column != task.status:
+            if task.id in app.selection and len(app.selection) > 1:
+                app.move_tasks(app.selection, target_column)
+            else:
+                app.move_task(task.id, target_column)
+                
+    def cancel_drag(self, card=None):
+        # card: only cancel if that card is the one being dragged
+        if self.drag is None or card is not None and self.drag['card'] is not card:
+            return
+        if self.drag['active']:
+            self.drag['app'].ghost.hide()
+        self.drag = None
+        if self.drag_job:
+            self.after_cancel(self.drag_job)
+            self.drag_job = None
+
+class VirtualKanbanColumn(KanbanColumn):
+    # Builds TaskCards only for rows in or near the viewport and recycles
+    # them from a pool while scrolling. Row heights start as an estimate
+    # from font metrics and are corrected once a card has been measured.
+    PADX = 5
+    PADY = 6
+    OVERSCAN = 400  # pixels rendered above and below the viewport
+    CARD_CHROME = 72  # card height minus the description lines
+    
+    def build_content(self):
+        self.app = None
+        self.heights = {}
+        self.offsets = [0]
+        self.layout_dirty = False
+        self.layout_pending = False
+        self.pool = []
+        self.windows = {}
+        
+        self.desc_font = tkfont.Font(family='Segoe UI', size=12)
+        sample = 'abcdefghijklmnopqrstuvwxyz ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+        self.char_width = self.desc_font.measure(sample) / len(sample)
+        self.line_height = self.desc_font.metrics('linespace')
+        self.wrapped_lines = functools.lru_cache(maxsize=LAYOUT_CACHE_SIZE)(self._wrapped_lines)
+        
+        self.canvas.configure(yscrollcommand=self._on_scroll)
+        self.canvas.bind('<Configure>', lambda e: self.schedule_layout())
+        
+    def _on_scroll(self, first, last):
+        super()._on_scroll(first, last)
+        self.schedule_layout()
+        
+    def _wrapped_lines(self, description):
+        lines = 0
+        for paragraph in description.split('\n'):
+            lines += max(1, -(-int(len(paragraph) * self.char_width) // DESC_WRAP))
+        return lines
+        
+    def estimate_height(self, task):
+        return self.CARD_CHROME + self.wrapped_lines(task.description) * self.line_height + 2 * self.PADY
+        
+    def add_task_card(self, task, app):
+        self.app = app
+        old = self.tasks.get(task.id)
+        if old is None:
+            bisect.insort(self.order, self.sort_key(task))
+            self.heights[task.id] = self.estimate_height(task)
+        else:
+            self.reorder(old, task)
+            if old.description != task.description:
+                self.heights[task.id] = self.estimate_height(task)
+        self.tasks[task.id] = task
+        
+        card = self.cards.get(task.id)
+        if card:
+            card.bind_task(task)
+        self.layout_dirty = True
+        self.schedule_layout()
+        if old is None:
+            self.update_count()
+        
+    def remove_task_card(self, task_id):
+        task = self.tasks.pop(task_id, None)
+        if task is None:
+            return
+        del self.order[bisect.bisect_left(self.order, self.sort_key(task))]
+        del self.heights[task_id]
+        if task_id in self.cards:
+            self.release_card(task_id)
+        self.layout_dirty = True
+        self.schedule_layout()
+        self.update_count()
+        
+    def clear_tasks(self):
+        for task_id in list(self.cards):
+            self.release_card(task_id)
+        self.tasks = {}
+        self.order = []
+        self.heights = {}
+        self.layout_dirty = True
+        self.schedule_layout()
+        self.update_count()
+        
+    def acquire_card(self, task):
+        if self.pool:
+            card = self.pool.pop()
+            card.bind_task(task)
+            self.show_card(card, True)
+        else:
+            card = self.new_card(task)
+        self.cards[task.id] = card
+        return card
+        
+    def release_card(self, task_id):
+        card = self.cards.pop(task_id)
+        self.detach_card(card)
+        self.show_card(card, False)
+        self.pool.append(card)
+        
+    # Renderer hooks, overridden by CanvasKanbanColumn
+    def new_card(self, task):
+        card = TaskCard(self.canvas, task, self.app)
+        self.adopt_card(card)
+        self.windows[card] = self.canvas.create_window(0, 0, window=card, anchor='nw')
+        return card
+        
+    def show_card(self, card, shown):
+        self.canvas.itemconfigure(self.windows[card], state='normal' if shown else 'hidden')
+        
+    def place_card(self, card, y, width):
+        window = self.windows[card]
+        self.canvas.coords(window, self.PADX, y)
+        self.canvas.itemconfigure(window, width=width)
+        
+    def schedule_layout(self):
+        if not self.layout_pending:
+            self.layout_pending = True
+            self.after_idle(self.layout)
+            
+    @profiler.timed('column.layout')
+    def layout(self):
+        self.layout_pending = False
+        if self.layout_dirty:
+            offsets = [0]
+            for _, task_id in self.order:
+                offsets.append(offsets[-1] + self.heights[task_id])
+            self.offsets = offsets
+            self.layout_dirty = False
+            
+        width = self.canvas.winfo_width()
+        region = f'0 0 {width} {self.offsets[-1]}'
+        if self.canvas.cget('scrollregion') != region:
+            self.canvas.configure(scrollregion=region)
+            
+        top = self.canvas.canvasy(0)
+        bottom = top + self.canvas.winfo_height()
+        first = max(0, bisect.bisect_right(self.offsets, top - self.OVERSCAN) - 1)
+        last = min(len(self.order), bisect.bisect_left(self.offsets, bottom + self.OVERSCAN))
+        visible = {self.order[i][1]: i for i in range(first, last)}
+        
+        for task_id in [task_id for task_id in self.cards if task_id not in visible]:
+            self.release_card(task_id)
+            
+        for task_id, index in visible.items():
+            card = self.cards.get(task_id) or self.acquire_card(self.tasks[task_id])
+            self.place_card(card, self.offsets[index] + self.PADY, max(1, width - 2 * self.PADX))
+            
+        self.after_idle(self.measure_visible)
+        
+    def measure_visible(self):
+        # Replace estimated heights with the real ones of rendered cards
+        changed = False
+        for task_id, card in self.cards.items():
+            if card.winfo_reqheight() <= 1:
+                continue
+            height = card.winfo_reqheight() + 2 * self.PADY
+            if self.heights.get(task_id) != height:
+                self.heights[task_id] = height
+                changed = True
+        if changed:
+            self.layout_dirty = True
+            self.schedule_layout()
+
+class CanvasKanbanColumn(VirtualKanbanColumn):
+    # Virtual column whose cards are CanvasCards: a handful of canvas items
+    # per visible row instead of eight widgets. Clicks, drags, hover and the
+    # delete button are hit-tested through canvas item tags.
+    def build_content(self):
+        super().build_content()
+        self.status_font = tkfont.Font(family='Segoe UI', size=8, weight='bold')
+        self.small_font = tkfont.Font(family='Segoe UI', size=8)
+        self.date_font = tkfont.Font(family='Segoe UI', size=9)
+        self.header_height = max(self.status_font.metrics('linespace'), self.small_font.metrics('linespace'))
+        self.date_height = self.date_font.metrics('linespace')
+        self.text_layout = TextLayout(self.desc_font)
+        
+        canvas = self.canvas
+        canvas.tag_bind('card', '<Enter>', self._on_item_enter)
+        canvas.tag_bind('card', '<Leave>', self._on_card_leave)
+        canvas.tag_bind('cardbody', '<Button-1>', self._on_card_press)
+        canvas.tag_bind('cardbody', '<Control-Button-1>', self._on_card_toggle)
+        canvas.tag_bind('cardbody', '<B1-Motion>', self._on_card_motion)
+        canvas.tag_bind('cardbody', '<ButtonRelease-1>', self._on_card_release)
+        canvas.tag_bind('carddelete', '<Enter>', lambda e: self._on_delete_hover(True))
+        canvas.tag_bind('carddelete', '<Leave>', lambda e: self._on_delete_hover(False))
+        canvas.tag_bind('carddelete', '<ButtonRelease-1>', self._on_delete_click)
+        
+    def wrap_width(self, card_width):
+        return max(1, min(DESC_WRAP, card_width - 2 * CanvasCard.INSET))
+        
+    def current_card(self):
+        for tag in self.canvas.gettags('current'):
+            card = self.card_of.get(tag)
+            if card:
+                return card
+        return None
+        
+    def card_at(self, event):
+        # Press bindings are on 'cardbody' only, so this is never the delete button
+        return self.current_card()
+        
+    @profiler.timed('ui.on_hover')
+    def _on_item_enter(self, event):
+        self.set_hover_card(self.current_card())
+        
+    def _check_hover(self):
+        self.hover_check = None
+        self.set_hover_card(self.current_card())
+        
+    def _on_delete_hover(self, hovered):
+        card = self.current_card()
+        if card:
+            card.set_delete_hover(hovered)
+            
+    def _on_delete_click(self, event):
+        card = self.current_card()
+        if card:
+            card.set_delete_hover(False)
+            card.delete_task()
+            
+    def adopt_card(self, card):
+        self.card_of[card.tag] = card
+        
+    def new_card(self, task):
+        card = CanvasCard(self, task, self.app)
+        self.adopt_card(card)
+        return card
+        
+    def show_card(self, card, shown):
+        card.show(shown)
+        
+    def place_card(self, card, y, width):
+        card.place(y, width)
+        
+    def measure_visible(self):
+        # Drawn cards know their exact height from the cached text layout
+        changed = False
+        for task_id, card in self.cards.items():
+            height = card.height + 2 * self.PADY
+            if card.height and self.heights.get(task_id) != height:
+                self.heights[task_id] = height
+                changed = True
+        if changed:
+            self.layout_dirty = True
+            self.schedule_layout()
+
+class HistoryWindow(tk.Toplevel):
+    # Archived tasks, newest first, fetched a page at a time as the list is
+    # scrolled, so opening it costs one page however long the history is
+    def __init__(self, app):
+        super().__init__(app)
+        self.app = app
+        self.after_key = None
+        self.exhausted = False
+        self.loading = False
+        self.loaded = 0
+        
+        self.title('History')
+        self.geometry('900x600')
+        self.configure(bg=COLORS['bg_main'])
+        
+        header = tk.Frame(self, bg=COLORS['bg_secondary'])
+        header.pack(fill='x', padx=8, pady=(8, 0))
+        tk.Label(header, text='🕘 Archived Tasks', fg=COLORS['text_primary'], bg=COLORS['bg_secondary'],
+                 font=('Segoe UI', 14, 'bold')).pack(side='left', padx=12, pady=10)
+        self.count_var = tk.StringVar(value='Loading...')
+        tk.Label(header, textvariable=self.count_var, fg=COLORS['text_secondary'], bg=COLORS['bg_secondary'],
+                 font=('Segoe UI', 9)).pack(side='right', padx=12)
+        
+        body = tk.Frame(self, bg=COLORS['bg_main'])
+        body.pack(fill='both', expand=True, padx=8, pady=8)
+        columns = (('id', 'ID', 70), ('description', 'Description', 440), ('status', 'Status', 80),
+                   ('created', 'Created', 120), ('archived', 'Archived', 120))
+        self.tree = ttk.Treeview(body, columns=[name for name, _, _ in columns], show='headings')
+        for name, heading, width in columns:
+            self.tree.heading(name, text=heading)
+            self.tree.column(name, width=width, stretch=name == 'description')
+        self.scrollbar = ttk.Scrollbar(body, orient='vertical', command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._on_scroll)
+        self.tree.pack(side='left', fill='both', expand=True)
+        self.scrollbar.pack(side='right', fill='y')
+        
+        self.load_more()
+        
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if float(last) >= 0.9:
+            self.load_more()
+            
+    def load_more(self):
+        if self.exhausted or self.loading:
+            return
+        self.loading = True
+        
+        def on_success(rows):
+            if not self.winfo_exists():
+                return
+            self.loading = False
+            self.exhausted = len(rows) < storage.PAGE_SIZE
+            for row in rows:
+                self.tree.insert('', 'end', values=(f'#{row.id}', row.description.replace('\n', ' '),
+                                                    row.status.upper(),
+                                                    row.created_at.strftime('%Y-%m-%d %H:%M'),
+                                                    row.archived_at.strftime('%Y-%m-%d %H:%M')))
+            if rows:
+                self.after_key = (rows[-1].archived_at, rows[-1].id)
+            self.loaded += len(rows)
+            self.count_var.set(f'{self.loaded} archived tasks' if self.exhausted else f'{self.loaded} loaded, scroll for more')
+            
+        def on_error(e):
+            if not self.winfo_exists():
+                return
+            self.loading = False
+            self.exhausted = True
+            messagebox.showerror('Database Error', f'Failed to load history: {e}', parent=self)
+            
+        self.app.db.submit(self.app.repo.history, self.after_key, storage.PAGE_SIZE,
+                           on_success=on_success, on_error=on_error)
+
+class TodoApp(tk.Tk):
+    def __init__(self, Session=None, journal=None):
+        # Session: an open database, as returned by storage.init_db; without
+        # one the window comes up first and the database is opened behind it
+        super().__init__()
+        self.title('To-Do List')
+        self.geometry('1400x800')
+        self.configure(bg=COLORS['bg_main'])
+        self.repo = None
+        self.db = DBExecutor(self)
+        self.startup = {}  # milestone -> ms since STARTED
+        self.store = TaskStore()  # TaskRecords on the board, by id
+        self.selection = set()
+        self.search_query = ''
+        self.search_job = None
+        self.board_generation = 0  # bumped when the filter changes, stale results are dropped
+        self.sync_stamp = None     # database time of the last change poll
+        self.sync_job = None
+        self.journal = journal or Journal()
+        self.flush_job = None
+        self.flushing = False
+        self.offline = False
+        self.archive_job = None
+        self.history_window = None
+        self.api = None
+        self.protocol('WM_DELETE_WINDOW', self.on_close)
+        
+        self.grid_rowconfigure(1, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_columnconfigure(1, weight=1)
+        self.grid_columnconfigure(2, weight=1)
+        
+        self.setup_ui()
+        self.bind('<Expose>', self._on_first_expose)
+        if Session is None:
+            self.open_storage()
+        else:
+            self.storage_ready(importlib.import_module('storage'), Session)
+            
+    def mark_startup(self, milestone):
+        self.startup[milestone] = round((time.perf_counter() - STARTED) * 1000, 1)
+        profiler.record(f'startup.{milestone}', self.startup[milestone] / 1000)
+        
+    def _on_first_expose(self, event):
+        self.unbind('<Expose>')
+        # Expose comes before the redraw, which Tk does when idle
+        self.after_idle(self.mark_startup, 'first_paint')
+        
+    def open_storage(self):
+        # Import storage and open the database on the DB thread; init_db
+        # skips the schema checks when the stored version is current
+        self.status_var.set('Connecting to the database...')
+        
+        def load():
+            module = importlib.import_module('storage')
+            return module, module.init_db()
+            
+        def on_error(e):
+            self.status_var.set(f'Cannot open the database ({e}), retrying...')
+            self.after(FLUSH_RETRY_MS, self.open_storage)
+            
+        self.db.submit(load, on_success=lambda result: self.storage_ready(*result), on_error=on_error)
+        
+    def storage_ready(self, module, Session):
+        global storage
+        storage = module
+        self.repo = storage.TaskRepository(Session)
+        self.mark_startup('storage_ready')
+        for button in self.db_buttons:
+            button.configure(state='normal')
+            
+        if SYNC_INTERVAL_MS:
+            self.poll_changes()  # takes the first stamp before the board loads
+        self.refresh_tasks()
+        if self.journal.pending(1):
+            self.schedule_flush()  # replay what an earlier session left queued
+        else:
+            self.db.submit(self.repo.prune_applied_ops)
+        self.db.submit(self.repo.prune_tombstones)
+        if storage.ARCHIVE_AFTER_DAYS:
+            self.archive_old()
+        if API_SERVER:
+            self.start_api(Session)
+            
+    def start_api(self, Session):
+        # Writes through the API reach the board via the change feed
+        from api_server import ApiServer
+        api = ApiServer(Session)
+        try:
+            api.start()
+        except OSError as e:
+            self.status_var.set(f'API server not started: {e}')
+            return
+        self.api = api
+        
+    def setup_ui(self):
+        header = tk.Frame(self, bg=COLORS['accent'], height=80)
+        header.grid(row=0, column=0, columnspan=3, sticky='ew', padx=8, pady=(8, 0))
+        header.grid_propagate(False)
+        
+        title_label = tk.Label(header, text='To-Do List',
+                              fg=COLORS['text_primary'], bg=COLORS['accent'],
+                              font=('Segoe UI', 20, 'bold'))
+        title_label.pack(side='left', padx=20, pady=20)
+        
+        btn_frame = tk.Frame(header, bg=COLORS['accent'])
+        btn_frame.pack(side='right', padx=20, pady=10)
+        
+        search_frame = tk.Frame(header, bg=COLORS['bg_main'])
+        search_frame.pack(side='left', padx=20, pady=22)
+        
+        tk.Label(search_frame, text='🔍', fg=COLORS['text_secondary'], bg=COLORS['bg_main'],
+                 font=('Segoe UI', 11)).pack(side='left', padx=(8, 0))
+        
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add('write', lambda *args: self.schedule_search())
+        search_entry = tk.Entry(search_frame, textvariable=self.search_var, width=32,
+                                bg=COLORS['bg_main'], fg=COLORS['text_primary'],
+                                insertbackground=COLORS['text_primary'],
+                                font=('Segoe UI', 11), bd=0, relief='flat')
+        search_entry.pack(side='left', padx=8, pady=6)
+        search_entry.bind('<Escape>', lambda e: self.search_var.set(''))
+        
+        add_btn = tk.Button(btn_frame, text='+ Add Task', command=self.add_task,
+                           bg=COLORS['bg_main'], fg=COLORS['text_primary'],
+                           font=('Segoe UI', 11, 'bold'), bd=0, padx=16, pady=8,
+                           cursor='hand2', relief='flat')
+        add_btn.pack(side='left', padx=(0, 8))
+        
+        refresh_btn = tk.Button(btn_frame, text='🔄 Refresh', command=self.refresh_tasks,
+                               bg=COLORS['bg_secondary'], fg=COLORS['text_primary'],
+                               font=('Segoe UI', 11), bd=0, padx=16, pady=8,
+                               cursor='hand2', relief='flat')
+        refresh_btn.pack(side='left')
+        
+        archive_btn = tk.Button(btn_frame, text='🗄 Archive Done', command=self.archive_done,
+                               bg=COLORS['bg_secondary'], fg=COLORS['text_primary'],
+                               font=('Segoe UI', 11), bd=0, padx=16, pady=8,
+                               cursor='hand2', relief='flat')
+        archive_btn.pack(side='left', padx=(8, 0))
+        
+        history_btn = tk.Button(btn_frame, text='🕘 History', command=self.show_history,
+                               bg=COLORS['bg_secondary'], fg=COLORS['text_primary'],
+                               font=('Segoe UI', 11), bd=0, padx=16, pady=8,
+                               cursor='hand2', relief='flat')
+        history_btn.pack(side='left', padx=(8, 0))
+        
+        # Enabled once the database is open
+        self.db_buttons = [add_btn, refresh_btn, archive_btn, history_btn]
+        for button in self.db_buttons:
+            button.configure(state='disabled')
+        
+        self.columns = {}
+        if CARD_RENDERER == 'canvas':
+            column_class = CanvasKanbanColumn
+        else:
+            column_class = VirtualKanbanColumn if VIRTUAL_COLUMNS else KanbanColumn
+        
+        # To-Do Column
+        self.columns['todo'] = column_class(self, 'TO-DO', COLORS['column_todo'], 'todo')
+        self.columns['todo'].grid(row=1, column=0, sticky='nsew', padx=(8, 4), pady=8)
+        
+        # Doing Column
+        self.columns['doing'] = column_class(self, 'DOING', COLORS['column_doing'], 'doing')
+        self.columns['doing'].grid(row=1, column=1, sticky='nsew', padx=4, pady=8)
+        
+        # Done Column
+        self.columns['done'] = column_class(self, 'DONE', COLORS['column_done'], 'done')
+        self.columns['done'].grid(row=1, column=2, sticky='nsew', padx=(4, 8), pady=8)
+        
+        titles = {'todo': 'TO-DO', 'doing': 'DOING', 'done': 'DONE'}
+        for status, column in self.columns.items():
+            column.on_scroll_end = self.load_more
+            for target, title in titles.items():
+                if target != status:
+                    column.menu.add_command(label=f'Move all to {title}',
+                                            command=lambda s=status, t=target: self.move_column(s, t))
+                    
+        self.ghost = DragGhost(self)
+        self.bind('<Delete>', self._on_delete_key)
+        self.bind('<Escape>', lambda e: self.clear_selection())
+        
+        # Status bar
+        self.status_var = tk.StringVar()
+        self.status_var.set('Ready')
+        self.status_bar = status_bar = tk.Label(self, textvariable=self.status_var,
+                             bg=COLORS['bg_secondary'], fg=COLORS['text_secondary'],
+                             font=('Segoe UI', 9), anchor='w', padx=10)
+        status_bar.grid(row=2, column=0, columnspan=3, sticky='ew', padx=8, pady=(0, 8))
+        
+        # Profiler readout, F12 toggles profiling, Ctrl+F12 dumps the samples
+        self.profile_var = tk.StringVar()
+        self.profile_job = None
+        self.profile_label = tk.Label(status_bar, textvariable=self.profile_var,
+                                     bg=COLORS['bg_secondary'], fg=COLORS['priority_medium'],
+                                     font=('Consolas', 9))
+        self.bind('<F12>', lambda e: self.toggle_profiler())
+        self.bind('<Control-F12>', lambda e: self.dump_profile())
+        if profiler.enabled:
+            self.show_profile_overlay()
+        
+    def add_task(self):
+        task_dialog = tk.Toplevel(self)
+        task_dialog.title('Create New Task')
+        task_dialog.geometry('600x450')
+        task_dialog.configure(bg='#f8f9fa')
+        task_dialog.resizable(False, False)
+        
+        task_dialog.transient(self)
+        task_dialog.grab_set()
+        
+        selected_status = tk.StringVar(value='todo')
+        
+        header_frame = tk.Frame(task_dialog, bg='#4a90e2', height=70)
+        header_frame.pack(fill='x', pady=(0, 25))
+        header_frame.pack_propagate(False)
+        
+        tk.Label(header_frame, text='📝 Create New Task',
+                fg='white', bg='#4a90e2',
+                font=('Segoe UI', 18, 'bold')).pack(expand=True)
+        
+        content_frame = tk.Frame(task_dialog, bg='#f8f9fa')
+        content_frame.pack(fill='both', expand=True, padx=35)
+        
+        tk.Label(content_frame, text='Task Description:',
+                fg='#2c3e50', bg='#f8f9fa',
+                font=('Segoe UI', 12, 'bold')).pack(anchor='w', pady=(0, 8))
+        
+        desc_frame = tk.Frame(content_frame, bg='white', relief='solid', bd=1)
+        desc_frame.pack(fill='x', pady=(0, 25))
+        
+        desc_text = tk.Text(desc_frame, height=6, font=('Segoe UI', 11),
+                           bg='white', fg='#2c3e50',
+                           relief='flat', bd=12, wrap='word',
+                           insertbackground='#4a90e2')
+        desc_text.pack(fill='both', expand=True)
+        
+        status_frame = tk.LabelFrame(content_frame, text=' Initial Status ',
+                                    fg='#2c3e50', bg='#f8f9fa',
+                                    font=('Segoe UI', 11, 'bold'), bd=1,
+                                    relief='solid')
+        status_frame.pack(fill='x', pady=(0, 25))
+        
+        status_inner = tk.Frame(status_frame, bg='#f8f9fa')
+        status_inner.pack(fill='x', padx=15, pady=10)
+        
+        statuses = [('todo', '📋 To-Do', '#3742fa'),
+                   ('doing', '⚡ Doing', '#ffa502'),
+                   ('done', '✅ Done', '#2ed573')]
+        
+        def update_status(value):
+            selected_status.set(value)
+        
+        for value, text, color in statuses:
+            cb_frame = tk.Frame(status_inner, bg='#f8f9fa')
+            cb_frame.pack(fill='x', pady=4)
+            
+            cb = tk.Radiobutton(cb_frame, text=text,
+                               variable=selected_status, value=value,
+                               fg=color, bg='#f8f9fa',
+                               selectcolor='white',
+                               font=('Segoe UI', 11, 'bold'), anchor='w',
+                               activebackground='#f8f9fa',
+                               activeforeground=color,
+                               command=lambda v=value: update_status(v))
+            cb.pack(side='left')
+        
+        # Buttons
+        btn_frame = tk.Frame(task_dialog, bg='#f8f9fa')
+        btn_frame.pack(pady=25)
+        
+        def create_task():
+            description = desc_text.get('1.0', 'end-1c').strip()
+            if not description:
+                messagebox.showwarning('Warning', 'Please enter a task description!')
+                return
+            
+            task_dialog.destroy()
+            self._create_task(description, selected_status.get())
+        
+        ok_btn = tk.Button(btn_frame, text='✓ OK', command=create_task,
+                          bg='#27ae60', fg='white',
+                          font=('Segoe UI', 12, 'bold'), bd=0, padx=30, pady=12,
+                          cursor='hand2', relief='flat')
+        ok_btn.pack(side='left', padx=8)
+        
+        cancel_btn = tk.Button(btn_frame, text='✕ Cancel', command=task_dialog.destroy,
+                              bg='#e74c3c', fg='white',
+                              font=('Segoe UI', 12, 'bold'), bd=0, padx=25, pady=12,
+                              cursor='hand2', relief='flat')
+        cancel_btn.pack(side='left', padx=8)
+        
+        def on_hover(btn, hover_color):
+            def enter(e):
+                btn.configure(bg=hover_color)
+            def leave(e):
+                original_colors = {'#219a52': '#27ae60', '#c0392b': '#e74c3c'}
+                btn.configure(bg=original_colors.get(hover_color, btn.cget('bg')))
+            return enter, leave
+        
+        ok_enter, ok_leave = on_hover(ok_btn, '#219a52')
+        ok_btn.bind('<Enter>', ok_enter)
+        ok_btn.bind('<Leave>', ok_leave)
+        
+        cancel_enter, cancel_leave = on_hover(cancel_btn, '#c0392b')
+        cancel_btn.bind('<Enter>', cancel_enter)
+        cancel_btn.bind('<Leave>', cancel_leave)
+        
+        task_dialog.bind('<Return>', lambda event: create_task())
+        
+        desc_text.focus_set()
+        
+    # Single-task writes go to the journal first and show on the board
+    # right away; flush_journal() commits them in batches, see journal.py
+    def _create_task(self, description, status):
+        op = self.journal.append('create', description=description, status=status,
+                                 created_at=datetime.utcnow().isoformat())
+        self.apply_changes(upserts=[TaskRecord(op['temp_id'], description, status,
+                                               datetime.fromisoformat(op['created_at']), 0)])
+        self.schedule_flush()
+            
+    def move_task(self, task_id, new_status):
+        original = self.store.get(task_id)
+        if original is None:
+            return
+        old_status = original.status
+        self.apply_changes(upserts=[original.replace(status=new_status)])
+        # Unsaved tasks have no version to check yet
+        self.journal.append('move', task_id, status=new_status, from_status=old_status,
+                            version=original.version if task_id > 0 else None)
+        self.schedule_flush()
+            
+    def delete_task(self, task_id):
+        original = self.store.get(task_id)
+        if original is None:
+            return
+        self.apply_changes(deleted=[task_id])
+        self.journal.append('delete', task_id, version=original.version if task_id > 0 else None)
+        self.schedule_flush()
+        
+    def schedule_flush(self, delay=FLUSH_DELAY_MS):
+        if self.flush_job is None and not self.flushing:
+            self.flush_job = self.after(delay, self.flush_journal)
+            
+    def flush_journal(self):
+        self.flush_job = None
+        self.flushing = True
+        
+        def on_success(results):
+            self.flushing = False
+            if self.offline:
+                self.offline = False
+                self.status_var.set('Back online, queued changes saved')
+            for op, outcome, value in results:
+                self._apply_op_result(op, outcome, value)
+            if self.journal.pending(1):
+                self.schedule_flush()
+                
+        def on_error(e):
+            self.flushing = False
+            if isinstance(e, storage.OFFLINE_ERRORS):
+                self.offline = True
+                self.status_var.set(f'Offline, {len(self.journal.pending())} changes queued')
+            else:
+                self.status_var.set(f'Failed to save changes: {e}')
+            self.schedule_flush(FLUSH_RETRY_MS)
+            
+        self.db.submit(flush, self.journal, self.repo, on_success=on_success, on_error=on_error)
+        
+    def _apply_op_result(self, op, outcome, value):
+        kind = op['kind']
+        if kind == 'create':
+            task_id = value.id if outcome == 'ok' else op['temp_id']
+        else:
+            task_id = op['task_id']
+        if outcome == 'ok':
+            if kind == 'create':
+                status_text = STATUS_TEXT[op['status']]
+                description = op['description']
+                self.status_var.set(f'Task created in {status_text}: {description[:30]}...' if len(description) > 30 else f'Task created in {status_text}: {description}')
+                shown = self.store.get(op['temp_id'])
+                self.apply_changes(deleted=[op['temp_id']])
+                if shown is None:
+                    return  # deleted again before it was saved, the queued delete follows
+                if self.search_query:
+                    # Let the database decide whether the new task matches the filter
+                    self.refresh_tasks([value.status])
+                else:
+                    self.apply_changes(upserts=[TaskRecord.of(value, status=shown.status)])
+            elif kind == 'move':
+                self.status_var.set(f"Moved task #{task_id} from {op['from_status'].upper()} to {op['status'].upper()}")
+                if not self.journal.touches(task_id):
+                    self.apply_changes(upserts=[value])
+            else:
+                self.status_var.set(f'Deleted task #{task_id}')
+        elif outcome == 'conflict':
+            self.show_conflict(value)
+        elif outcome == 'missing':
+            self.apply_changes(deleted=[task_id])
+            self.status_var.set(f'Task #{task_id} no longer exists')
+        else:
+            if kind == 'create':
+                # refresh_tasks() leaves unsaved cards alone, take this one off
+                self.apply_changes(deleted=[op['temp_id']])
+            messagebox.showerror('Error', f'Failed to save task #{task_id}: {value}')
+            self.refresh_tasks()
+        
+    def show_conflict(self, e):
+        # Another client changed the task first: show their version instead
+        if e.task is None:
+            self.apply_changes(deleted=[e.task_id])
+        else:
+            self.apply_changes(upserts=[e.task])
+        self.status_var.set(f'{e}, your change was not applied')
+            
+    def column_at(self, root_x):
+        for status, column in self.columns.items():
+            col_x = column.winfo_rootx()
+            if col_x <= root_x <= col_x + column.winfo_width():
+                return status
+        return None
+        
+    def _on_delete_key(self, event):
+        if not isinstance(event.widget, tk.Entry):
+            self.delete_tasks(self.selection)
+            
+    def schedule_search(self):
+        if self.search_job:
+            self.after_cancel(self.search_job)
+        self.search_job = self.after(SEARCH_DEBOUNCE_MS, self.run_search)
+        
+    def run_search(self):
+        self.search_job = None
+        query = self.search_var.get().strip()
+        if query == self.search_query:
+            return
+        self.search_query = query
+        self.board_generation += 1
+        for column in self.columns.values():
+            for card in column.cards.values():
+                card.set_highlight(bool(query))
+        # One query per column so each fills in as soon as its matches arrive
+        for status in self.columns:
+            self.refresh_tasks([status], reset=True)
+            
+    def toggle_selection(self, task_id):
+        if task_id in self.selection:
+            self.selection.discard(task_id)
+        else:
+            self.selection.add(task_id)
+        self._show_selected(task_id)
+        
+    def clear_selection(self):
+        selected, self.selection = self.selection, set()
+        for task_id in selected:
+            self._show_selected(task_id)
+            
+    def _show_selected(self, task_id):
+        column = self.columns.get(self.store.status(task_id))
+        card = column.cards.get(task_id) if column else None
+        if card:
+            card.set_selected(task_id in self.selection)
+            
+    def move_tasks(self, task_ids, new_status):
+        originals = [self.store.get(task_id) for task_id in task_ids
+                     if task_id in self.store and self.store.status(task_id) != new_status]
+        if not originals:
+            return
+        self.clear_selection()
+        originals = self._queue_unsaved(originals, self.move_task, new_status)
+        if not originals:
+            return
+        self.apply_changes(upserts=[task.replace(status=new_status) for task in originals])
+        
+        def on_success(result):
+            versions, conflicts = result
+            # Show the versions just written, so the next move of one of these
+            # tasks is not mistaken for a conflict with this one
+            upserts = []
+            for task in originals:
+                current = self.store.get(task.id)
+                if task.id in versions and current and current.status == new_status and current.version == task.version:
+                    upserts.append(current.replace(version=versions[task.id]))
+            self.apply_changes(upserts=upserts)
+            # Tasks someone else changed first keep their change, like a single move
+            for e in conflicts:
+                self.show_conflict(e)
+            skipped = f', {len(conflicts)} changed by someone else were not moved' if conflicts else ''
+            self.status_var.set(f'Moved {len(versions)} tasks to {new_status.upper()}{skipped}')
+            
+        def on_error(e):
+            self.apply_changes(upserts=originals)
+            messagebox.showerror('Error', f'Failed to move tasks: {e}')
+            
+        self.db.submit(self.repo.move_many, [task.id for task in originals], new_status,
+                       {task.id: task.version for task in originals},
+                       on_success=on_success, on_error=on_error)
+        
+    def delete_tasks(self, task_ids):
+        originals = [self.store.get(task_id) for task_id in task_ids if task_id in self.store]
+        if not originals:
+            return
+        if not messagebox.askyesno('Confirm Delete', f'Are you sure you want to delete {len(originals)} tasks?'):
+            return
+        self.clear_selection()
+        originals = self._queue_unsaved(originals, self.delete_task)
+        if not originals:
+            return
+        self.apply_changes(deleted=[task.id for task in originals])
+        
+        def on_success(deleted):
+            self.status_var.set(f'Deleted {deleted} tasks')
+            
+        def on_error(e):
+            self.apply_changes(upserts=originals)
+            messagebox.showerror('Error', f'Failed to delete tasks: {e}')
+            
+        self.db.submit(self.repo.delete_many, [task.id for task in originals],
+                       on_success=on_success, on_error=on_error)
+        
+    def _queue_unsaved(self, tasks, write, *args):
+        # Tasks with a temporary id only exist in the journal, so their write
+        # is queued behind the create instead of going to the set-based
+        # query. Returns the saved tasks.
+        for task in tasks:
+            if task.id < 0:
+                write(task.id, *args)
+        return [task for task in tasks if task.id > 0]
+        
+    def move_column(self, old_status, new_status):
+        total = self.columns[old_status].total
+        if not total or not messagebox.askyesno('Confirm Move', f'Move all {total} tasks from {old_status.upper()} to {new_status.upper()}?'):
+            return
+        
+        def on_success(moved):
+            self.status_var.set(f'Moved {moved} tasks from {old_status.upper()} to {new_status.upper()}')
+            self.refresh_tasks([old_status, new_status])
+            
+        def on_error(e):
+            messagebox.showerror('Error', f'Failed to move tasks: {e}')
+            
+        self.db.submit(self.repo.move_all, old_status, new_status, on_success=on_success, on_error=on_error)
+        
+    def archive_done(self):
+        total = self.columns['done'].total
+        if not total or not messagebox.askyesno('Confirm Archive', f'Archive all {total} done tasks?'):
+            return
+        
+        def on_success(archived):
+            self.status_var.set(f'Archived {archived} done tasks')
+            self.refresh_tasks(['done'])
+            
+        def on_error(e):
+            messagebox.showerror('Error', f'Failed to archive tasks: {e}')
+            
+        self.db.submit(self.repo.archive_done, on_success=on_success, on_error=on_error)
+            
+    def archive_old(self, archived=0):
+        # Move done tasks older than storage.ARCHIVE_AFTER_DAYS to the archive, one
+        # batch per DB job so board reads and writes can go in between
+        self.archive_job = None
+        
+        def on_success(moved):
+            if moved == storage.ARCHIVE_BATCH:
+                self.archive_old(archived + moved)
+                return
+            if archived + moved:
+                self.status_var.set(f'Archived {archived + moved} done tasks older than {storage.ARCHIVE_AFTER_DAYS} days')
+                self.refresh_tasks(['done'])
+            self.archive_job = self.after(ARCHIVE_INTERVAL_MS, self.archive_old)
+            
+        def on_error(e):
+            self.status_var.set(f'Archiving old done tasks failed: {e}')
+            self.archive_job = self.after(ARCHIVE_INTERVAL_MS, self.archive_old)
+            
+        self.db.submit(self.repo.archive_batch, storage.ARCHIVE_AFTER_DAYS, storage.ARCHIVE_BATCH,
+                       on_success=on_success, on_error=on_error)
+        
+    def show_history(self):
+        if self.history_window and self.history_window.winfo_exists():
+            self.history_window.lift()
+        else:
+            self.history_window = HistoryWindow(self)
+            
+    def apply_changes(self, upserts=(), deleted=(), in_window=False):
+        # in_window: the rows come from a page query, so they are already
+        # counted and belong to the column's loaded range
+        with profiler.span('board.clear'):
+            for task_id in deleted:
+                record = self.store.pop(task_id)
+                if record and record.status in self.columns:
+                    column = self.columns[record.status]
+                    column.remove_task_card(task_id)
+                    column.set_total(column.total - 1)
+                    
+        with profiler.span('board.build'):
+            self._apply_upserts(upserts, in_window)
+            
+    def _apply_upserts(self, upserts, in_window):
+        # upserts: repository rows or TaskRecords; the board keeps records only
+        for task in upserts:
+            task = TaskRecord.of(task)
+            old_status = self.store.status(task.id)
+            column = self.columns.get(task.status)
+            if old_status != task.status:
+                if old_status in self.columns:
+                    old_column = self.columns[old_status]
+                    old_column.remove_task_card(task.id)
+                    old_column.set_total(old_column.total - 1)
+                if column and not in_window:
+                    column.set_total(column.total + 1)
+            if column and (in_window or column.covers(task)):
+                column.add_task_card(task, self)
+                self.store.put(task)
+            else:
+                self.store.pop(task.id)
+                
+    def load_more(self, status):
+        column = self.columns[status]
+        if column.exhausted or self.repo is None:
+            column.loading = False
+            return
+        
+        generation = self.board_generation
+        
+        def on_success(tasks):
+            column.loading = False
+            if generation != self.board_generation:
+                return
+            column.exhausted = len(tasks) < storage.PAGE_SIZE
+            self.apply_changes(upserts=tasks, in_window=True)
+            
+        def on_error(e):
+            column.loading = False
+            column.exhausted = True
+            messagebox.showerror('Database Error', f'Failed to load tasks: {e}')
+            
+        after = column.order[-1] if column.order else None
+        self.db.submit(self.repo.page, status, after, storage.PAGE_SIZE, self.search_query,
+                       on_success=on_success, on_error=on_error)
+            
+    def refresh_tasks(self, statuses=None, reset=False):
+        # Reload the range that is already on screen, at least one page per
+        # column; reset starts over from the first page
+        if self.repo is None:
+            return  # storage_ready() loads the board
+        statuses = statuses or list(self.columns)
+        limits = {status: storage.PAGE_SIZE if reset else max(len(self.columns[status].order), storage.PAGE_SIZE)
+                  for status in statuses}
+        generation = self.board_generation
+        search = self.search_query
+        
+        @profiler.timed('refresh.apply')
+        def on_success(result):
+            if generation != self.board_generation:
+                return
+            pages, counts = result
+            upserts = []
+            seen = set()
+            for status, tasks in pages.items():
+                column = self.columns[status]
+                column.exhausted = len(tasks) < limits[status]
+                for task in tasks:
+                    seen.add(task.id)
+                    current = self.store.get(task.id)
+                    if current is None or current.status != task.status or current.version != task.version:
+                        upserts.append(task)
+                        
+            # Unsaved tasks (negative ids) are not in the database yet
+            deleted = [record.id for record in self.store
+                       if record.status in limits and record.id not in seen and record.id > 0]
+            self.apply_changes(upserts=upserts, deleted=deleted, in_window=True)
+            
+            for status, column in self.columns.items():
+                column.set_total(counts.get(status, 0))
+                    
+            if 'first_page' not in self.startup:
+                self.after_idle(self.report_startup)
+                
+            total_tasks = sum(counts.values())
+            if search:
+                self.status_var.set(f'Found {total_tasks} tasks matching "{search}"')
+            else:
+                self.status_var.set(f'Loaded {len(seen)} of {total_tasks} tasks')
+            
+        def on_error(e):
+            messagebox.showerror('Database Error', f'Failed to load tasks: {e}')
+            
+        self.status_var.set('Loading tasks...')
+        self.db.submit(self.repo.load_board, limits, search, on_success=on_success, on_error=on_error)
+        
+    def schedule_poll(self):
+        if SYNC_INTERVAL_MS and self.sync_job is None:
+            self.sync_job = self.after(SYNC_INTERVAL_MS, self.poll_changes)
+            
+    def poll_changes(self):
+        # Apply rows other clients changed since the last poll. The next
+        # poll is only scheduled once this one has answered.
+        self.sync_job = None
+        generation = self.board_generation
+        
+        def on_success(result):
+            tasks, deleted, counts, stamp = result
+            self.sync_stamp = stamp
+            self.schedule_poll()
+            if generation != self.board_generation:
+                return  # the refresh for the new search sees these changes too
+            if tasks is None:
+                self.refresh_tasks()
+                return
+            self.apply_remote_changes(tasks, deleted, counts)
+            
+        def on_error(e):
+            if not isinstance(e, storage.OFFLINE_ERRORS):
+                self.status_var.set(f'Sync failed: {e}')
+            self.schedule_poll()
+            
+        self.db.submit(self.repo.changes, self.sync_stamp, self.search_query,
+                       on_success=on_success, on_error=on_error)
+        
+    @profiler.timed('sync.apply')
+    def apply_remote_changes(self, tasks, deleted, counts):
+        # Polls overlap, so only rows newer than the board's copy are applied
+        upserts = []
+        for task in tasks:
+            current = self.store.get(task.id)
+            if current is None or current.version < task.version:
+                upserts.append(task)
+        deleted = [task_id for task_id in deleted if task_id in self.store]
+        if upserts or deleted:
+            self.apply_changes(upserts=upserts, deleted=deleted)
+        if counts is not None:
+            for status, column in self.columns.items():
+                column.set_total(counts.get(status, 0))
+                
+    def report_startup(self):
+        self.mark_startup('first_page')
+        if STARTUP_REPORT:
+            print(json.dumps(self.startup))
+            self.on_close()
+            
+    def toggle_profiler(self):
+        if profiler.toggle():
+            self.show_profile_overlay()
+            self.status_var.set('Profiling on (Ctrl+F12 to dump)')
+        else:
+            self.profile_label.place_forget()
+            self.status_var.set('Profiling off')
+            
+    def show_profile_overlay(self):
+        self.profile_label.place(relx=1.0, rely=0.5, x=-10, anchor='e')
+        if self.profile_job:
+            self.after_cancel(self.profile_job)
+        self.update_profile_overlay()
+        
+    def update_profile_overlay(self):
+        if not profiler.enabled:
+            return
+        summary = profiler.summary()
+        slowest = sorted(summary.items(), key=lambda item: item[1]['total_ms'], reverse=True)[:4]
+        parts = [f"{name} p50 {stats['p50_ms']:.1f} / max {stats['max_ms']:.1f} ms" for name, stats in slowest]
+        if self.repo:
+            parts.append(f"pool wait {self.repo.stats()['avg_wait_ms']:.1f} ms")
+        self.profile_var.set('  ·  '.join(parts))
+        self.profile_job = self.after(500, self.update_profile_overlay)
+        
+    def dump_profile(self):
+        path = profiler.dump(time.strftime('profile-%Y%m%d-%H%M%S.json'))
+        self.status_var.set(f'Profile written to {path}')
+        
+    def on_close(self):
+        if self.sync_job:
+            self.after_cancel(self.sync_job)
+        if self.flush_job:
+            self.after_cancel(self.flush_job)
+        if self.archive_job:
+            self.after_cancel(self.archive_job)
+        # Let queued writes finish before the window goes away; anything not
+        # flushed stays in the journal for the next start
+        if self.api:
+            self.api.stop()
+        self.db.shutdown()
+        if self.repo:
+            self.repo.close()
+        self.journal.close()
+        self.destroy()
+
+def main():
+    app = TodoApp()
+    
+    def on_btn_hover(btn, hover_color):
+        def enter(e):
+            btn.configure(bg=hover_color)
+        def leave(e):
+            btn.configure(bg=btn.original_color)
+        return enter, leave
+    
+    app.mainloop()
+
+if __name__ == '__main__':
     main()
\ No newline at end of file
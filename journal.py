@@ -0,0 +1,146 @@
+import json
+import os
+import threading
+import uuid
+
+# ---------- CONFIG ----------
+JOURNAL_PATH = os.environ.get('TODO_JOURNAL_PATH', 'todo-journal.jsonl')
+JOURNAL_FSYNC = True     # fsync every append, so a queued write survives a crash
+FLUSH_BATCH = 500        # operations applied per transaction
+
+class Journal:
+    # Append-only log of writes the database has not confirmed yet, one JSON
+    # object per line. An operation line is written (and fsynced) before the
+    # board shows the change; an {"ack": seq} line once it was committed or
+    # rejected. Tasks created here get negative temporary ids until their
+    # create is acknowledged with the real one.
+    #
+    # Appends come from the Tk thread and acks from the DB thread.
+    def __init__(self, path=JOURNAL_PATH, fsync=JOURNAL_FSYNC):
+        self.path = path
+        self.fsync = fsync
+        self.lock = threading.Lock()
+        self.ops = {}    # seq -> operation, in append order
+        self.ids = {}    # temporary id -> real id, for operations queued behind a create
+        self.seq = 0
+        self.next_temp_id = -1
+        self._load()
+        self.file = open(self.path, 'a', encoding='utf-8')
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # torn last line from a crash mid-append
+                if 'ack' in entry:
+                    op = self.ops.pop(entry['ack'], None)
+                    if op and op['kind'] == 'create' and entry.get('task_id'):
+                        self.ids[op['temp_id']] = entry['task_id']
+                else:
+                    self.ops[entry['seq']] = entry
+                    self.seq = max(self.seq, entry['seq'])
+                    if entry['kind'] == 'create':
+                        self.next_temp_id = min(self.next_temp_id, entry['temp_id'] - 1)
+
+        # Rewrite the file with only what is still pending
+        for op in self.ops.values():
+            op['task_id'] = self.ids.get(op.get('task_id'), op.get('task_id'))
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for op in self.ops.values():
+                f.write(json.dumps(op) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _write(self, entry):
+        self.file.write(json.dumps(entry) + '\n')
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+
+    def append(self, kind, task_id=None, **fields):
+        # Returns the operation; creates carry their temporary id as temp_id
+        with self.lock:
+            self.seq += 1
+            op = {'seq': self.seq, 'op_id': uuid.uuid4().hex, 'kind': kind,
+                  'task_id': self.ids.get(task_id, task_id), **fields}
+            if kind == 'create':
+                op['temp_id'] = self.next_temp_id
+                self.next_temp_id -= 1
+            self._write(op)
+            self.ops[op['seq']] = op
+            return op
+
+    def ack(self, op, task_id=None):
+        # task_id: the real id of an acknowledged create
+        with self.lock:
+            self._write({'ack': op['seq'], 'task_id': task_id})
+            self.ops.pop(op['seq'], None)
+            if op['kind'] == 'create' and task_id:
+                self.ids[op['temp_id']] = task_id
+                for queued in self.ops.values():
+                    if queued['task_id'] == op['temp_id']:
+                        queued['task_id'] = task_id
+            if not self.ops:
+                self.file.truncate(0)
+
+    def pending(self, limit=None):
+        with self.lock:
+            ops = list(self.ops.values())
+        return ops[:limit] if limit else ops
+
+    def touches(self, task_id):
+        # Whether a queued operation still targets the task
+        with self.lock:
+            return any(op['task_id'] == task_id for op in self.ops.values())
+
+    def close(self):
+        self.file.close()
+
+def flush(journal, repo, limit=FLUSH_BATCH):
+    # Apply the oldest pending operations in one transaction and acknowledge
+    # them. Returns [(op, outcome, value)] as described in
+    # TaskRepository.apply_ops. Connection errors propagate with everything
+    # still queued. If another error breaks the batch, the operations are
+    # retried one per transaction and the one that fails alone is dropped
+    # as 'failed'.
+    from storage import OFFLINE_ERRORS  # not at the top, the UI imports storage after the window is up
+    ops = journal.pending(limit)
+    if not ops:
+        return []
+    try:
+        results = [(op, *result) for op, result in zip(ops, repo.apply_ops(ops))]
+    except OFFLINE_ERRORS:
+        raise
+    except Exception as e:
+        if len(ops) == 1:
+            results = [(ops[0], 'failed', e)]
+        else:
+            # Each one is acknowledged as soon as it is through, so an
+            # operation queued behind a create already carries the real id
+            results = []
+            for op in ops:
+                try:
+                    result = (op, *repo.apply_ops([op])[0])
+                except OFFLINE_ERRORS:
+                    if results:
+                        break  # keep what made it, the rest waits for the next flush
+                    raise
+                except Exception as e:
+                    result = (op, 'failed', e)
+                _ack(journal, *result)
+                results.append(result)
+            return results
+
+    for result in results:
+        _ack(journal, *result)
+    return results
+
+def _ack(journal, op, outcome, value):
+    created = op['kind'] == 'create' and outcome == 'ok'
+    journal.ack(op, value.id if created else None)
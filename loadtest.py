@@ -0,0 +1,186 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import storage
+from bench import STATUSES, seed, summarize
+
+# Requests per second against the HTTP API (api_server.py).
+#
+#   python loadtest.py                                   # throwaway SQLite board, own server
+#   python loadtest.py --url http://127.0.0.1:8765 --duration 30
+#
+# Without --url it seeds --size tasks into a temporary SQLite file and starts
+# api_server.py on it in a separate process, so client and server do not
+# share a GIL. Each scenario runs for --duration seconds over --connections
+# keep-alive connections and reports requests per second, latency
+# percentiles and status codes as JSON. The move and create scenarios write
+# to the board, do not point them at one you care about.
+
+SCENARIOS = ['list', 'conditional_list', 'move', 'create']
+
+class Client:
+    # One keep-alive HTTP/1.1 connection, just enough for JSON requests
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None, headers=None):
+        # Returns (status, headers, body)
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        payload = json.dumps(body).encode() if body is not None else b''
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host}', f'Content-Length: {len(payload)}']
+        if body is not None:
+            lines.append('Content-Type: application/json')
+        lines.extend(f'{name}: {value}' for name, value in (headers or {}).items())
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + payload)
+
+        status = int((await self.reader.readline()).split()[1])
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+        length = int(response_headers.get('content-length') or 0)
+        data = await self.reader.readexactly(length) if length else b''
+        if response_headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status, response_headers, data
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+        self.reader = self.writer = None
+
+async def run_scenario(name, host, port, connections, duration, max_id):
+    latencies = []
+    statuses = {}
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        client = Client(host, port)
+        etags = {}
+        try:
+            while time.perf_counter() < deadline:
+                status_name = random.choice(STATUSES)
+                if name in ('list', 'conditional_list'):
+                    path = f'/tasks?status={status_name}'
+                    headers = {'If-None-Match': etags[path]} if path in etags else None
+                    request = ('GET', path, None, headers)
+                elif name == 'move':
+                    request = ('PATCH', f'/tasks/{random.randint(1, max_id)}', {'status': status_name}, None)
+                else:
+                    request = ('POST', '/tasks', {'description': f'Load test task {random.random()}',
+                                                  'status': status_name}, None)
+                start = time.perf_counter()
+                status, headers, _ = await client.request(*request)
+                latencies.append(time.perf_counter() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+                if name == 'conditional_list' and 'etag' in headers:
+                    etags[request[1]] = headers['etag']
+        finally:
+            client.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(connections)])
+    elapsed = time.perf_counter() - start
+    result = {'requests': len(latencies), 'rps': round(len(latencies) / elapsed, 1),
+              'statuses': {str(status): count for status, count in sorted(statuses.items())}}
+    if latencies:
+        result.update(summarize(latencies))
+    return result
+
+def wait_for_port(host, port, process, timeout=30):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f'api_server.py exited with {process.returncode}')
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit('api_server.py did not start listening')
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start_server(workdir, size):
+    path = os.path.join(workdir, 'loadtest.db')
+    Session = storage.init_db(storage.SQLiteBackend(path))
+    seed(Session, size)
+    Session.kw['bind'].dispose()
+
+    port = free_port()
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api_server.py')
+    env = dict(os.environ, TODO_SQLITE_PATH=path)
+    process = subprocess.Popen([sys.executable, script, '--backend', 'sqlite', '--port', str(port)], env=env)
+    wait_for_port('127.0.0.1', port, process)
+    return process, port
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure requests per second against the HTTP API')
+    parser.add_argument('--url', help='a running server; by default one is started on a temporary SQLite board')
+    parser.add_argument('--size', type=int, default=10000, help='tasks to seed when starting a server')
+    parser.add_argument('--connections', type=int, default=16, help='concurrent keep-alive connections')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per scenario')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='comma separated, from: ' + ', '.join(SCENARIOS))
+    parser.add_argument('--output', default='-', help="JSON output file, '-' for stdout")
+    args = parser.parse_args()
+
+    scenarios = args.scenarios.split(',')
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario: {', '.join(sorted(unknown))}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        process = None
+        if args.url:
+            url = urlsplit(args.url)
+            host, port = url.hostname, url.port or 80
+        else:
+            process, port = start_server(workdir, args.size)
+            host = '127.0.0.1'
+        try:
+            report = {
+                'meta': {
+                    'timestamp': datetime.utcnow().isoformat(timespec='seconds'),
+                    'url': args.url or f'http://{host}:{port} (sqlite, {args.size} tasks)',
+                    'connections': args.connections,
+                    'duration_s': args.duration,
+                },
+                'results': {},
+            }
+            for name in scenarios:
+                report['results'][name] = asyncio.run(run_scenario(name, host, port, args.connections,
+                                                                   args.duration, args.size))
+                print(f"{name}: {report['results'][name]['rps']} requests/s", file=sys.stderr)
+        finally:
+            if process:
+                process.terminate()
+                process.wait()
+
+    output = json.dumps(report, indent=2)
+    if args.output == '-':
+        print(output)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+
+if __name__ == '__main__':
+    main()
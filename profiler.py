@@ -0,0 +1,140 @@
+import functools
+import json
+import os
+import time
+from collections import defaultdict, deque
+
+# ---------- CONFIG ----------
+PROFILE = os.environ.get('TODO_PROFILE') == '1'   # start with profiling on
+RING_SIZE = 4096                                  # samples kept in memory
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_SPAN = _NullSpan()
+
+class _Span:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, time.perf_counter() - self.start)
+        return False
+
+class Profiler:
+    # Hot-path timings in a ring buffer. While disabled, span() hands out a
+    # shared no-op context manager, timed() functions cost one attribute
+    # check, and no SQLAlchemy listeners are installed.
+    def __init__(self, enabled=PROFILE, size=RING_SIZE):
+        self.enabled = False
+        self.samples = deque(maxlen=size)  # (name, wall clock, seconds); appends are thread-safe
+        self.engines = []
+        if enabled:
+            self.enable()
+
+    def enable(self):
+        if not self.enabled:
+            self.enabled = True
+            for engine in self.engines:
+                self._listen(engine)
+
+    def disable(self):
+        if self.enabled:
+            self.enabled = False
+            for engine in self.engines:
+                self._unlisten(engine)
+
+    def toggle(self):
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+        return self.enabled
+
+    def record(self, name, seconds):
+        self.samples.append((name, time.time(), seconds))
+
+    def span(self, name):
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self, name)
+
+    def timed(self, name):
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.record(name, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    # Database statements are timed through cursor events on watched engines
+    def watch_engine(self, engine):
+        self.engines.append(engine)
+        if self.enabled:
+            self._listen(engine)
+
+    # SQLAlchemy is imported here so that importing the profiler stays cheap
+    def _listen(self, engine):
+        import sqlalchemy as sa
+        sa.event.listen(engine, 'before_cursor_execute', self._before_execute)
+        sa.event.listen(engine, 'after_cursor_execute', self._after_execute)
+
+    def _unlisten(self, engine):
+        import sqlalchemy as sa
+        if sa.event.contains(engine, 'before_cursor_execute', self._before_execute):
+            sa.event.remove(engine, 'before_cursor_execute', self._before_execute)
+            sa.event.remove(engine, 'after_cursor_execute', self._after_execute)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info['profile_start'] = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        start = conn.info.pop('profile_start', None)
+        if start is not None:
+            verb = statement.split(None, 1)[0].lower() if statement.strip() else 'query'
+            self.record(f'db.{verb}', time.perf_counter() - start)
+
+    def summary(self):
+        durations = defaultdict(list)
+        for name, _, seconds in list(self.samples):
+            durations[name].append(seconds * 1000)
+        result = {}
+        for name, values in durations.items():
+            values.sort()
+            result[name] = {
+                'count': len(values),
+                'total_ms': round(sum(values), 3),
+                'p50_ms': round(values[len(values) // 2], 3),
+                'max_ms': round(values[-1], 3),
+            }
+        return result
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            json.dump({
+                'summary': self.summary(),
+                'samples': [{'name': name, 'at': at, 'ms': round(seconds * 1000, 3)}
+                            for name, at, seconds in list(self.samples)],
+            }, f, indent=2)
+        return path
+
+profiler = Profiler()
@@ -0,0 +1,878 @@
+from datetime import datetime, timedelta
+import itertools
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.pool import NullPool
+from profiler import profiler
+
+# ---------- CONFIG ----------
+STORAGE_BACKEND = os.environ.get('TODO_BACKEND', 'mysql')   # 'mysql' or 'sqlite'
+
+MYSQL_USER = "root"
+MYSQL_PASSWORD = ""    
+MYSQL_HOST = "localhost"
+MYSQL_PORT = 3306
+DB_NAME = "todo_db"
+
+CONN_URL_DB = f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{DB_NAME}?charset=utf8mb4"
+CONN_URL_SERVER = f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/?charset=utf8mb4"
+
+SQLITE_PATH = os.environ.get('TODO_SQLITE_PATH', 'todo.db')
+
+# Connection pool
+POOL_SIZE = 5            # connections kept open
+POOL_MAX_OVERFLOW = 5    # extra connections allowed under load
+POOL_TIMEOUT = 10        # seconds to wait for a free connection
+POOL_RECYCLE = 1800      # seconds before a connection is replaced, below MySQL's wait_timeout
+POOL_PRE_PING = True     # test connections on checkout so dropped ones are replaced
+
+PAGE_SIZE = 200          # tasks fetched per column page
+IMPORT_BATCH = 5000      # rows per executemany (and transaction) in bulk imports and exports
+STATUSES = ('todo', 'doing', 'done')
+SYNC_OVERLAP = 2         # seconds re-read on every change poll, covers commits that land after their timestamp
+SYNC_LIMIT = 1000        # changed rows per poll before the caller should reload instead
+TOMBSTONE_DAYS = 7       # deleted task ids kept for the change feed, a client that last polled earlier reloads
+
+# Archive
+ARCHIVE_AFTER_DAYS = 30  # done tasks untouched this long move to tasks_archive, 0 keeps them
+ARCHIVE_BATCH = 1000     # tasks moved per transaction, keeps lock times short
+
+Base = declarative_base()
+
+class utcnow(sa.sql.expression.FunctionElement):
+    # Database clock in UTC with microseconds, so every client stamps rows
+    # with the same clock no matter how far apart their own clocks are
+    type = sa.DateTime()
+    inherit_cache = True
+
+@compiles(utcnow)
+def _utcnow_default(element, compiler, **kw):
+    return 'CURRENT_TIMESTAMP'
+
+@compiles(utcnow, 'mysql')
+def _utcnow_mysql(element, compiler, **kw):
+    return 'UTC_TIMESTAMP(6)'
+
+@compiles(utcnow, 'sqlite')
+def _utcnow_sqlite(element, compiler, **kw):
+    # Six fractional digits, like the datetimes SQLAlchemy stores
+    return "strftime('%Y-%m-%d %H:%M:%f000', 'now')"
+
+Timestamp = sa.DateTime().with_variant(mysql.DATETIME(fsp=6), 'mysql')
+
+# Errors meaning the database cannot be reached right now, as opposed to
+# rejecting a statement; writes are kept queued and retried later
+OFFLINE_ERRORS = (sa.exc.OperationalError, sa.exc.InterfaceError, sa.exc.TimeoutError,
+                  sa.exc.DisconnectionError, ConnectionError)
+
+class ConflictError(Exception):
+    # The task changed or vanished since the caller last saw it; `task` is
+    # its current state, None when it was deleted
+    def __init__(self, task_id, task=None):
+        super().__init__(f'Task #{task_id} was changed by someone else')
+        self.task_id = task_id
+        self.task = task
+
+class Task(Base):
+    __tablename__ = "tasks"
+    id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
+    description = sa.Column(sa.String(1024), nullable=False)
+    status = sa.Column(sa.String(20), default='todo')  
+    created_at = sa.Column(Timestamp, default=datetime.utcnow)  # microseconds, the board's sort key and page cursor
+    position = sa.Column(sa.Integer, nullable=False, default=0, server_default='0')  # 0 keeps created_at order
+    updated_at = sa.Column(Timestamp, default=utcnow(), onupdate=utcnow())
+    version = sa.Column(sa.Integer, nullable=False, default=1, server_default='1')
+    
+    __table_args__ = (
+        sa.Index('ix_tasks_status_created_id', 'status', 'created_at', 'id'),
+        sa.Index('ix_tasks_updated_at', 'updated_at'),
+        # Never reuse the id of a deleted or archived task, see migration 7
+        {'sqlite_autoincrement': True},
+    )
+    # ORM updates and deletes check the version they loaded and bump it;
+    # eager_defaults reads the new updated_at back during the flush
+    __mapper_args__ = {'version_id_col': version, 'eager_defaults': True}
+
+class TaskTombstone(Base):
+    # One row per deleted or archived task, so other clients can drop it
+    __tablename__ = "task_tombstones"
+    id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
+    task_id = sa.Column(sa.Integer, nullable=False)
+    deleted_at = sa.Column(Timestamp, nullable=False, default=utcnow(), index=True)
+
+class AppliedOp(Base):
+    # Journal operations already committed, so a replay after a crash
+    # between commit and acknowledgement does not apply them twice
+    __tablename__ = "applied_ops"
+    op_id = sa.Column(sa.String(32), primary_key=True)
+    task_id = sa.Column(sa.Integer)
+    applied_at = sa.Column(Timestamp, nullable=False, default=utcnow(), index=True)
+
+class TaskArchive(Base):
+    __tablename__ = "tasks_archive"
+    id = sa.Column(sa.Integer, primary_key=True, autoincrement=False)
+    description = sa.Column(sa.String(1024), nullable=False)
+    status = sa.Column(sa.String(20))
+    created_at = sa.Column(Timestamp)
+    position = sa.Column(sa.Integer, nullable=False, default=0)
+    archived_at = sa.Column(sa.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        sa.Index('ix_tasks_archive_archived_id', 'archived_at', 'id'),
+    )
+
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+    version = sa.Column(sa.Integer, primary_key=True, autoincrement=False)
+    description = sa.Column(sa.String(255), nullable=False)
+    applied_at = sa.Column(sa.DateTime, default=datetime.utcnow)
+    duration_ms = sa.Column(sa.Float)
+
+# ---------- MIGRATIONS ----------
+# Each migration runs once, in its own transaction, and is recorded in
+# schema_version. They must tolerate a schema that create_all() has
+# already brought up to date, since fresh databases get the full model.
+# init_db skips create_all() once the latest migration is recorded, so a
+# new table or index needs a migration of its own to reach old databases.
+
+def _task_columns(conn):
+    return {column['name'] for column in sa.inspect(conn).get_columns('tasks')}
+
+def _migrate_status_column(conn):
+    columns = _task_columns(conn)
+    if 'status' not in columns:
+        conn.execute(sa.text("ALTER TABLE tasks ADD COLUMN status VARCHAR(20) DEFAULT 'todo'"))
+        if 'done' in columns:
+            conn.execute(sa.text("UPDATE tasks SET status = 'done' WHERE done = 1"))
+            conn.execute(sa.text("UPDATE tasks SET status = 'todo' WHERE done = 0"))
+
+def _migrate_board_index(conn):
+    indexes = {index['name'] for index in sa.inspect(conn).get_indexes('tasks')}
+    if 'ix_tasks_status_created_id' not in indexes:
+        index = next(index for index in Task.__table__.indexes if index.name == 'ix_tasks_status_created_id')
+        index.create(conn)
+
+def _migrate_position_column(conn):
+    if 'position' not in _task_columns(conn):
+        conn.execute(sa.text("ALTER TABLE tasks ADD COLUMN position INTEGER NOT NULL DEFAULT 0"))
+
+def _migrate_search_index(conn):
+    BACKENDS.get(conn.dialect.name, StorageBackend).install_search(conn)
+
+def _migrate_row_versions(conn):
+    columns = _task_columns(conn)
+    if 'updated_at' not in columns:
+        column_type = Task.__table__.c.updated_at.type.compile(dialect=conn.dialect)
+        conn.execute(sa.text(f"ALTER TABLE tasks ADD COLUMN updated_at {column_type} NULL"))
+        conn.execute(sa.text("UPDATE tasks SET updated_at = created_at"))
+    if 'version' not in columns:
+        conn.execute(sa.text("ALTER TABLE tasks ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+    indexes = {index['name'] for index in sa.inspect(conn).get_indexes('tasks')}
+    if 'ix_tasks_updated_at' not in indexes:
+        index = next(index for index in Task.__table__.indexes if index.name == 'ix_tasks_updated_at')
+        index.create(conn)
+
+def _migrate_archive_index(conn):
+    indexes = {index['name'] for index in sa.inspect(conn).get_indexes('tasks_archive')}
+    if 'ix_tasks_archive_archived_id' not in indexes:
+        index = next(iter(TaskArchive.__table__.indexes))
+        index.create(conn)
+
+def _migrate_task_autoincrement(conn):
+    # Without AUTOINCREMENT SQLite hands out the highest id again once that
+    # task is deleted or archived, and archiving the new task then fails on
+    # tasks_archive's primary key. The flag needs a rebuild of the table.
+    if conn.dialect.name != 'sqlite':
+        return
+    create_sql = conn.execute(sa.text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'tasks'")).scalar()
+    if 'AUTOINCREMENT' in create_sql.upper():
+        return
+    triggers = conn.execute(sa.text("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'tasks'")).scalars().all()
+    existing = _task_columns(conn)
+    columns = [column.name for column in Task.__table__.columns if column.name in existing]
+    # Continue above every id already handed out, archived and tombstoned ones included
+    highest = max([value for value in conn.execute(sa.select(
+        sa.select(sa.func.max(Task.id)).scalar_subquery(),
+        sa.select(sa.func.max(TaskArchive.id)).scalar_subquery(),
+        sa.select(sa.func.max(TaskTombstone.task_id)).scalar_subquery())).one() if value is not None], default=0)
+    
+    rebuilt = Task.__table__.to_metadata(sa.MetaData(), name='tasks_rebuilt')
+    rebuilt.indexes.clear()  # created under their real names after the rename
+    rebuilt.create(conn)
+    conn.execute(sa.text("INSERT INTO sqlite_sequence (name, seq) VALUES ('tasks_rebuilt', :seq)"), {'seq': highest})
+    # Tasks that already got the id of an archived one move to a new id,
+    # with a tombstone so other boards drop the old one
+    reused = sa.text('id IN (SELECT id FROM tasks_archive)')
+    names = ', '.join(columns)
+    conn.execute(sa.text(f'INSERT INTO tasks_rebuilt ({names}) SELECT {names} FROM tasks WHERE NOT {reused}'))
+    names = ', '.join(name for name in columns if name != 'id')
+    conn.execute(sa.text(f'INSERT INTO tasks_rebuilt ({names}) SELECT {names} FROM tasks WHERE {reused} ORDER BY id'))
+    conn.execute(sa.insert(TaskTombstone).from_select(['task_id'], sa.select(Task.id).where(reused)))
+    conn.execute(sa.text('DROP TABLE tasks'))
+    conn.execute(sa.text('ALTER TABLE tasks_rebuilt RENAME TO tasks'))
+    conn.execute(sa.text("UPDATE sqlite_sequence SET name = 'tasks' WHERE name = 'tasks_rebuilt'"))
+    for index in Task.__table__.indexes:
+        index.create(conn)
+    for statement in triggers:
+        conn.execute(sa.text(statement))
+    conn.execute(sa.text("INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')"))
+
+def _migrate_created_at_precision(conn):
+    # A plain MySQL DATETIME rounds created_at to the second, so the copy of
+    # a task the board just created sorted apart from the one read back
+    if conn.dialect.name != 'mysql':
+        return
+    for table in ('tasks', 'tasks_archive'):
+        conn.execute(sa.text(f"ALTER TABLE {table} MODIFY created_at DATETIME(6) NULL"))
+
+MIGRATIONS = [
+    (1, 'add tasks.status', _migrate_status_column),
+    (2, 'add (status, created_at, id) index on tasks', _migrate_board_index),
+    (3, 'add tasks.position', _migrate_position_column),
+    (4, 'add full-text index on tasks.description', _migrate_search_index),
+    (5, 'add tasks.updated_at and tasks.version', _migrate_row_versions),
+    (6, 'add (archived_at, id) index on tasks_archive', _migrate_archive_index),
+    (7, 'never reuse task ids on SQLite', _migrate_task_autoincrement),
+    (8, 'store created_at with microseconds on MySQL', _migrate_created_at_precision),
+]
+
+def schema_is_current(engine):
+    # One query instead of create_all()'s table checks and the migration scan
+    try:
+        with engine.connect() as conn:
+            latest = conn.execute(sa.select(sa.func.max(SchemaVersion.version))).scalar()
+    except sa.exc.DBAPIError:
+        return False  # no schema_version table yet
+    return latest is not None and latest >= MIGRATIONS[-1][0]
+
+def run_migrations(engine):
+    with engine.connect() as conn:
+        applied = set(conn.execute(sa.select(SchemaVersion.version)).scalars())
+        
+    for version, description, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        start = time.perf_counter()
+        with engine.begin() as conn:
+            migrate(conn)
+            duration_ms = (time.perf_counter() - start) * 1000
+            conn.execute(sa.insert(SchemaVersion).values(version=version, description=description,
+                                                          duration_ms=duration_ms))
+        print(f'Applied migration {version} ({description}) in {duration_ms:.1f} ms', file=sys.stderr)
+
+class PoolStats:
+    # Counters for pool checkouts and the time spent waiting for a connection
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.engine = None
+        self.connects = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        
+    def attach(self, engine):
+        self.engine = engine
+        sa.event.listen(engine, 'connect', self._on_connect)
+        sa.event.listen(engine, 'checkout', self._on_checkout)
+        
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self.lock:
+            self.connects += 1
+            
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self.lock:
+            self.checkouts += 1
+            
+    def record_wait(self, seconds):
+        with self.lock:
+            self.waits += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            
+    def snapshot(self):
+        pool = self.engine.pool if self.engine else None
+        with self.lock:
+            return {
+                'size': pool.size() if hasattr(pool, 'size') else None,
+                'checked_out': pool.checkedout() if hasattr(pool, 'checkedout') else None,
+                'overflow': pool.overflow() if hasattr(pool, 'overflow') else None,
+                'connects': self.connects,
+                'checkouts': self.checkouts,
+                'avg_wait_ms': self.wait_total / self.waits * 1000 if self.waits else 0.0,
+                'max_wait_ms': self.wait_max * 1000,
+            }
+
+pool_stats = PoolStats()
+
+# ---------- BACKENDS ----------
+
+class StorageBackend:
+    # Everything server-specific about opening the task database; the
+    # models, migrations and TaskRepository are shared by all backends.
+    name = None
+    
+    def create_engine(self):
+        raise NotImplementedError
+        
+    def ensure_database(self, engine):
+        pass
+        
+    # Full-text search on tasks.description, `terms` are plain word tokens
+    @classmethod
+    def install_search(cls, conn):
+        pass
+        
+    @classmethod
+    def search_filter(cls, terms):
+        return sa.and_(*[Task.description.contains(term, autoescape=True) for term in terms])
+
+class MySQLBackend(StorageBackend):
+    name = 'mysql'
+    
+    def __init__(self, url=CONN_URL_DB, server_url=CONN_URL_SERVER):
+        self.url = url
+        self.server_url = server_url
+        
+    def create_engine(self):
+        return sa.create_engine(self.url, echo=False, future=True,
+                                pool_size=POOL_SIZE, max_overflow=POOL_MAX_OVERFLOW,
+                                pool_timeout=POOL_TIMEOUT, pool_recycle=POOL_RECYCLE,
+                                pool_pre_ping=POOL_PRE_PING)
+        
+    def ensure_database(self, engine):
+        # The first pooled connection doubles as the existence check, the
+        # server-level connection is only opened when the database is missing
+        try:
+            with engine.connect():
+                return
+        except sa.exc.OperationalError:
+            pass
+        
+        server = sa.create_engine(self.server_url, poolclass=NullPool)
+        try:
+            with server.begin() as conn:
+                conn.execute(sa.text(f"CREATE DATABASE IF NOT EXISTS `{engine.url.database}` DEFAULT CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci;"))
+        except Exception as e:
+            raise RuntimeError(f"Cannot create/access MySQL database: {e}")
+        finally:
+            server.dispose()
+            
+    @classmethod
+    def install_search(cls, conn):
+        indexes = {index['name'] for index in sa.inspect(conn).get_indexes('tasks')}
+        if 'ft_tasks_description' not in indexes:
+            conn.execute(sa.text("ALTER TABLE tasks ADD FULLTEXT INDEX ft_tasks_description (description)"))
+            
+    @classmethod
+    def search_filter(cls, terms):
+        # MATCH ... AGAINST in boolean mode, every term required, prefix matches
+        return Task.description.match(' '.join(f'+{term}*' for term in terms))
+
+class SQLiteBackend(StorageBackend):
+    # Embedded single-file database, no server round-trips at startup.
+    # WAL lets the board read while the DB thread writes.
+    name = 'sqlite'
+    PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',   # durable across app crashes in WAL mode, fsync only at checkpoints
+        'busy_timeout': 5000,
+        'temp_store': 'MEMORY',
+        'cache_size': -32000,      # KiB
+        'mmap_size': 268435456,
+        'foreign_keys': 'ON',
+    }
+    
+    def __init__(self, path=SQLITE_PATH):
+        self.path = path
+        
+    def create_engine(self):
+        engine = sa.create_engine(f'sqlite:///{self.path}', echo=False, future=True,
+                                  pool_size=POOL_SIZE, max_overflow=POOL_MAX_OVERFLOW,
+                                  pool_timeout=POOL_TIMEOUT,
+                                  connect_args={'check_same_thread': False})
+        sa.event.listen(engine, 'connect', self._set_pragmas)
+        return engine
+        
+    def _set_pragmas(self, dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in self.PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
+        
+    # External-content FTS5 table kept in sync with tasks by triggers; status
+    # changes do not touch it since the update trigger is on description only
+    FTS_SCHEMA = [
+        "CREATE VIRTUAL TABLE tasks_fts USING fts5(description, content='tasks', content_rowid='id')",
+        "CREATE TRIGGER tasks_fts_ai AFTER INSERT ON tasks BEGIN "
+        "INSERT INTO tasks_fts(rowid, description) VALUES (new.id, new.description); END",
+        "CREATE TRIGGER tasks_fts_ad AFTER DELETE ON tasks BEGIN "
+        "INSERT INTO tasks_fts(tasks_fts, rowid, description) VALUES ('delete', old.id, old.description); END",
+        "CREATE TRIGGER tasks_fts_au AFTER UPDATE OF description ON tasks BEGIN "
+        "INSERT INTO tasks_fts(tasks_fts, rowid, description) VALUES ('delete', old.id, old.description); "
+        "INSERT INTO tasks_fts(rowid, description) VALUES (new.id, new.description); END",
+    ]
+    
+    @classmethod
+    def install_search(cls, conn):
+        if conn.execute(sa.text("SELECT 1 FROM sqlite_master WHERE name = 'tasks_fts'")).first():
+            return
+        for statement in cls.FTS_SCHEMA:
+            conn.execute(sa.text(statement))
+        conn.execute(sa.text("INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')"))
+        
+    @classmethod
+    def search_filter(cls, terms):
+        matches = sa.text("SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH :fts_query") \
+            .bindparams(fts_query=' '.join(f'"{term}"*' for term in terms)) \
+            .columns(rowid=sa.Integer)
+        return Task.id.in_(matches)
+
+BACKENDS = {
+    'mysql': MySQLBackend,
+    'sqlite': SQLiteBackend,
+}
+
+def get_backend(name=None):
+    name = name or STORAGE_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown storage backend '{name}', expected one of: {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
+
+def init_db(backend=None):
+    backend = backend or get_backend()
+    engine = backend.create_engine()
+    try:
+        backend.ensure_database(engine)
+        if not schema_is_current(engine):
+            Base.metadata.create_all(engine)
+            run_migrations(engine)
+    except Exception:
+        # The UI retries while the database is down, don't keep one engine per attempt
+        engine.dispose()
+        raise
+    pool_stats.attach(engine)
+    profiler.watch_engine(engine)
+    Session = sessionmaker(bind=engine, expire_on_commit=False)
+    return Session
+
+def search_clause(session, text):
+    # Filter for a search box string, or None when it has no words
+    terms = re.findall(r'\w+', text or '')
+    if not terms:
+        return None
+    return BACKENDS.get(session.get_bind().dialect.name, StorageBackend).search_filter(terms)
+
+def fetch_page(session, status, after=None, limit=PAGE_SIZE, search=None):
+    # Keyset pagination on (created_at, id), `after` is the last key already loaded
+    query = session.query(Task).filter(Task.status == status).populate_existing()
+    clause = search_clause(session, search)
+    if clause is not None:
+        query = query.filter(clause)
+    if after is not None:
+        created_at, task_id = after
+        query = query.filter(sa.or_(Task.created_at > created_at,
+                                    sa.and_(Task.created_at == created_at, Task.id > task_id)))
+    return query.order_by(Task.created_at, Task.id).limit(limit).all()
+
+def count_by_status(session, search=None):
+    query = session.query(Task.status, sa.func.count())
+    clause = search_clause(session, search)
+    if clause is not None:
+        query = query.filter(clause)
+    return dict(query.group_by(Task.status).all())
+
+def insert_many(Session, rows, batch=IMPORT_BATCH):
+    # Bulk insert from any iterable of column dicts with the same keys. Each
+    # batch is one executemany in its own transaction, so memory stays at
+    # one batch whatever the input size; returns the number of rows.
+    engine = Session.kw['bind']
+    rows = iter(rows)
+    total = 0
+    while True:
+        chunk = list(itertools.islice(rows, batch))
+        if not chunk:
+            return total
+        with engine.begin() as conn:
+            conn.execute(Task.__table__.insert(), chunk)
+        total += len(chunk)
+
+def stream_tasks(Session, status=None, batch=IMPORT_BATCH):
+    # Every task as a plain row in id order, keyset paged so only one batch
+    # is in memory at a time
+    engine = Session.kw['bind']
+    table = Task.__table__
+    last_id = None
+    while True:
+        query = sa.select(table.c.id, table.c.description, table.c.status,
+                          table.c.created_at, table.c.updated_at).order_by(table.c.id).limit(batch)
+        if status is not None:
+            query = query.where(table.c.status == status)
+        if last_id is not None:
+            query = query.where(table.c.id > last_id)
+        with engine.connect() as conn:
+            rows = conn.execute(query).all()
+        yield from rows
+        if len(rows) < batch:
+            return
+        last_id = rows[-1].id
+
+def detached_copy(task, **changes):
+    # Transient copy for the UI, so widgets never touch the repository's session
+    values = {column.key: getattr(task, column.key) for column in Task.__table__.columns}
+    values.update(changes)
+    return Task(**values)
+
+class TaskRepository:
+    # Task persistence calls, meant to run on the DBExecutor thread. One
+    # long-lived session is reused as the unit of work; its identity map,
+    # kept alive by a bounded cache, answers repeated get() calls for tasks
+    # it has already loaded without another round-trip.
+    CACHE_SIZE = 5000
+    IN_CHUNK = 500  # ids per IN (...) list, all chunks share one transaction
+    
+    def __init__(self, Session):
+        self.session = Session()
+        self.cache = OrderedDict()
+        self.written = OrderedDict()  # task id -> version this repository last wrote
+        
+    @contextmanager
+    def unit_of_work(self):
+        session = self.session
+        start = time.perf_counter()
+        session.connection()
+        pool_stats.record_wait(time.perf_counter() - start)
+        try:
+            yield session
+            with profiler.span('db.commit'):
+                session.commit()
+        except Exception:
+            with profiler.span('db.rollback'):
+                session.rollback()
+            raise
+            
+    def _remember(self, tasks):
+        for task in tasks:
+            self.cache[task.id] = task
+            self.cache.move_to_end(task.id)
+        while len(self.cache) > self.CACHE_SIZE:
+            self.cache.popitem(last=False)
+        return [detached_copy(task) for task in tasks]
+        
+    def _wrote(self, task_id, version):
+        self.written[task_id] = version
+        self.written.move_to_end(task_id)
+        while len(self.written) > self.CACHE_SIZE:
+            self.written.popitem(last=False)
+        
+    def _get(self, session, task_id, version=None):
+        # version: the one the caller last saw, ConflictError if the row moved on
+        task = session.get(Task, task_id)
+        if not task:
+            self.cache.pop(task_id, None)
+            raise LookupError('Task not found')
+        if version is not None and task.version not in (version, self.written.get(task_id)):
+            # A version we wrote ourselves is fine: the caller just has not seen it yet
+            raise ConflictError(task_id, detached_copy(task))
+        return task
+        
+    @contextmanager
+    def _versioned(self, task_id):
+        # Another client committed first: the flush matched no row at the
+        # version this session had loaded
+        try:
+            yield
+        except StaleDataError:
+            raise ConflictError(task_id, self._current(task_id)) from None
+            
+    def _current(self, task_id):
+        with self.unit_of_work() as session:
+            task = session.get(Task, task_id, populate_existing=True)
+            if task is None:
+                self.cache.pop(task_id, None)
+                return None
+        return self._remember([task])[0]
+        
+    @staticmethod
+    def _tombstone(session, task_ids):
+        # task_ids: a select of the ids about to be deleted
+        session.execute(sa.insert(TaskTombstone).from_select(['task_id'], task_ids))
+        
+    def create(self, description, status):
+        with self.unit_of_work() as session:
+            task = Task(description=description, status=status)
+            session.add(task)
+        return self._remember([task])[0]
+        
+    def move(self, task_id, new_status, version=None):
+        with self._versioned(task_id), self.unit_of_work() as session:
+            task = self._get(session, task_id, version)
+            task.status = new_status
+        self._wrote(task.id, task.version)
+        return self._remember([task])[0]
+        
+    def delete(self, task_id, version=None):
+        with self._versioned(task_id), self.unit_of_work() as session:
+            session.delete(self._get(session, task_id, version))
+            session.add(TaskTombstone(task_id=task_id))
+        self.cache.pop(task_id, None)
+            
+    def apply_ops(self, ops):
+        # Apply journal operations (see journal.py) in one transaction and
+        # return one (outcome, value) per operation:
+        #   ('ok', task copy)             create and move, None for delete
+        #   ('conflict', ConflictError)   the task changed since it was queued
+        #   ('missing', None)             the task no longer exists
+        # Operations found in applied_ops were committed by an earlier
+        # attempt and are reported as 'ok' without running again, or as
+        # 'missing' when their task has been deleted or archived since.
+        ids = {}  # temporary id -> real id for creates in this batch
+        results = []
+        with self.unit_of_work() as session:
+            applied = dict(session.execute(sa.select(AppliedOp.op_id, AppliedOp.task_id).where(
+                AppliedOp.op_id.in_([op['op_id'] for op in ops]))).all())
+            for op in ops:
+                if op['kind'] == 'create' and op['op_id'] in applied:
+                    ids[op['temp_id']] = applied[op['op_id']]
+                    
+            # One query for every existing task the batch touches
+            wanted = sorted({ids.get(op['task_id'], op['task_id']) for op in ops if op['kind'] != 'create'} - {None})
+            for i in range(0, len(wanted), self.IN_CHUNK):
+                session.query(Task).filter(Task.id.in_(wanted[i:i + self.IN_CHUNK])).populate_existing().all()
+                
+            for op in ops:
+                task_id = ids.get(op['task_id'], op['task_id'])
+                if op['op_id'] in applied:
+                    if op['kind'] == 'delete':
+                        results.append(('ok', None))
+                        continue
+                    # The row may have been deleted or archived since
+                    task = session.get(Task, applied[op['op_id']])
+                    results.append(('ok', task) if task else ('missing', None))
+                    continue
+                try:
+                    if op['kind'] == 'create':
+                        task = Task(description=op['description'], status=op['status'],
+                                    created_at=datetime.fromisoformat(op['created_at']))
+                        session.add(task)
+                        session.flush()
+                        ids[op['temp_id']] = task_id = task.id
+                    elif op['kind'] == 'move':
+                        task = self._get(session, task_id, op.get('version'))
+                        task.status = op['status']
+                    else:
+                        session.delete(self._get(session, task_id, op.get('version')))
+                        session.add(TaskTombstone(task_id=task_id))
+                        task = None
+                except ConflictError as e:
+                    results.append(('conflict', e))
+                    continue
+                except LookupError:
+                    results.append(('missing', None))
+                    continue
+                session.add(AppliedOp(op_id=op['op_id'], task_id=task_id))
+                results.append(('ok', task))
+                
+        tasks = [task for outcome, task in results if outcome == 'ok' and task is not None]
+        for task in tasks:
+            self._wrote(task.id, task.version)
+        copies = iter(self._remember(tasks))
+        for op in ops:
+            if op['kind'] == 'delete':
+                self.cache.pop(ids.get(op['task_id'], op['task_id']), None)
+        return [(outcome, next(copies) if outcome == 'ok' and value is not None else value)
+                for outcome, value in results]
+        
+    def prune_applied_ops(self, days=7):
+        # Journal acknowledgements make old entries unnecessary
+        with self.unit_of_work() as session:
+            cutoff = datetime.utcnow() - timedelta(days=days)
+            return session.execute(sa.delete(AppliedOp).where(AppliedOp.applied_at < cutoff)).rowcount
+            
+    def prune_tombstones(self, days=TOMBSTONE_DAYS):
+        # Only polls newer than `days` read them, see changes(). The highest
+        # task id stays, migration 7 starts the id sequence above it.
+        with self.unit_of_work() as session:
+            cutoff = session.execute(sa.select(utcnow())).scalar() - timedelta(days=days)
+            highest = session.execute(sa.select(sa.func.max(TaskTombstone.task_id))).scalar()
+            return session.execute(sa.delete(TaskTombstone).where(
+                TaskTombstone.deleted_at < cutoff, TaskTombstone.task_id != highest)).rowcount
+            
+    # Set-based writes still bump the version, so other clients see the
+    # change, and leave tombstones for deletes. Moves count as written by
+    # this repository, like single ones, so a caller still holding the
+    # version from before is not refused.
+    def move_many(self, task_ids, new_status, versions=None):
+        # versions: {task id: version the caller last saw}; a task at another
+        # version, other than one this repository wrote, is left where it is.
+        # Returns ({task id: new version} for the tasks that were moved,
+        # [ConflictError] for those changed or deleted since)
+        task_ids = list(task_ids)
+        moved = {}
+        stale = []
+        with self.unit_of_work() as session:
+            for i in range(0, len(task_ids), self.IN_CHUNK):
+                chunk = task_ids[i:i + self.IN_CHUNK]
+                # Locked until the commit on MySQL, so the versions read here are the ones updated
+                current = dict(session.execute(sa.select(Task.id, Task.version)
+                                               .where(Task.id.in_(chunk)).with_for_update()).all())
+                matching = [task_id for task_id in chunk if task_id in current and (
+                    versions is None or versions.get(task_id) is None
+                    or current[task_id] in (versions[task_id], self.written.get(task_id)))]
+                if matching:
+                    session.execute(sa.update(Task).where(Task.id.in_(matching))
+                                    .values(status=new_status, version=Task.version + 1))
+                    moved.update((task_id, current[task_id] + 1) for task_id in matching)
+                stale += [task_id for task_id in chunk if task_id not in moved]
+            tasks = {}
+            for i in range(0, len(stale), self.IN_CHUNK):
+                tasks.update((task.id, task) for task in session.query(Task).filter(
+                    Task.id.in_(stale[i:i + self.IN_CHUNK])).populate_existing())
+        for task_id, version in moved.items():
+            self._wrote(task_id, version)
+        for task_id in stale:
+            if task_id not in tasks:
+                self.cache.pop(task_id, None)
+        return moved, [ConflictError(task_id, detached_copy(tasks[task_id]) if task_id in tasks else None)
+                       for task_id in stale]
+        
+    def delete_many(self, task_ids):
+        task_ids = list(task_ids)
+        deleted = 0
+        with self.unit_of_work() as session:
+            for i in range(0, len(task_ids), self.IN_CHUNK):
+                chunk = task_ids[i:i + self.IN_CHUNK]
+                self._tombstone(session, sa.select(Task.id).where(Task.id.in_(chunk)))
+                deleted += session.execute(sa.delete(Task).where(Task.id.in_(chunk))).rowcount
+        for task_id in task_ids:
+            self.cache.pop(task_id, None)
+        return deleted
+        
+    def move_all(self, old_status, new_status):
+        # Returns how many tasks moved
+        with self.unit_of_work() as session:
+            task_ids = session.execute(sa.select(Task.id).where(Task.status == old_status)).scalars().all()
+        return len(self.move_many(task_ids, new_status)[0])
+            
+    def archive_batch(self, older_than=None, batch=ARCHIVE_BATCH):
+        # Move up to `batch` done tasks into tasks_archive in one transaction
+        # and return how many moved. older_than: only tasks not updated for
+        # that many days, by the database clock.
+        columns = ['id', 'description', 'status', 'created_at', 'position']
+        with self.unit_of_work() as session:
+            query = sa.select(Task.id).where(Task.status == 'done')
+            if older_than is not None:
+                cutoff = session.execute(sa.select(utcnow())).scalar() - timedelta(days=older_than)
+                query = query.where(sa.func.coalesce(Task.updated_at, Task.created_at) < cutoff)
+            task_ids = session.execute(query.order_by(Task.id).limit(batch)).scalars().all()
+            if not task_ids:
+                return 0
+            
+            selected = sa.and_(Task.id.in_(task_ids), Task.status == 'done')
+            copied = sa.select(*[Task.__table__.c[name] for name in columns], sa.literal(datetime.utcnow())) \
+                .where(selected)
+            session.execute(sa.insert(TaskArchive).from_select(columns + ['archived_at'], copied))
+            # Only delete rows that made it into the archive
+            archived = sa.and_(selected, sa.exists().where(TaskArchive.id == Task.id))
+            self._tombstone(session, sa.select(Task.id).where(archived))
+            moved = session.execute(sa.delete(Task).where(archived)
+                                    .execution_options(synchronize_session='fetch')).rowcount
+        for task_id in task_ids:
+            self.cache.pop(task_id, None)
+        return moved
+        
+    def archive(self, older_than=None, batch=ARCHIVE_BATCH):
+        total = 0
+        while True:
+            moved = self.archive_batch(older_than, batch)
+            total += moved
+            if moved < batch:
+                return total
+                
+    def archive_done(self):
+        return self.archive()
+        
+    def history(self, after=None, limit=PAGE_SIZE):
+        # Archived tasks newest first, keyset paged on (archived_at, id);
+        # plain rows, the archive is read-only
+        query = sa.select(TaskArchive.id, TaskArchive.description, TaskArchive.status,
+                          TaskArchive.created_at, TaskArchive.archived_at)
+        if after is not None:
+            archived_at, task_id = after
+            query = query.where(sa.or_(TaskArchive.archived_at < archived_at,
+                                       sa.and_(TaskArchive.archived_at == archived_at, TaskArchive.id < task_id)))
+        query = query.order_by(TaskArchive.archived_at.desc(), TaskArchive.id.desc()).limit(limit)
+        with self.unit_of_work() as session:
+            return session.execute(query).all()
+            
+    def page(self, status, after=None, limit=PAGE_SIZE, search=None):
+        with self.unit_of_work() as session:
+            return self._remember(fetch_page(session, status, after, limit, search))
+            
+    def load_board(self, limits, search=None):
+        with self.unit_of_work() as session, profiler.span('refresh.query'):
+            pages = {status: self._remember(fetch_page(session, status, limit=limit, search=search))
+                     for status, limit in limits.items()}
+            return pages, count_by_status(session, search)
+            
+    def changes(self, since=None, search=None):
+        # Change feed for polling clients. Returns (tasks, deleted ids,
+        # counts, stamp): rows updated and tasks deleted since the `since`
+        # stamp of an earlier call, minus SYNC_OVERLAP, so a row can come back
+        # more than once and callers compare versions. tasks is None when
+        # more than SYNC_LIMIT rows changed or `since` is older than the
+        # tombstones kept (TOMBSTONE_DAYS); counts is None when nothing did.
+        # With a search, changed rows that no longer match count as deleted.
+        with self.unit_of_work() as session, profiler.span('sync.query'):
+            stamp = session.execute(sa.select(utcnow())).scalar()
+            if since is None:
+                return [], [], None, stamp
+            since -= timedelta(seconds=SYNC_OVERLAP)
+            if since < stamp - timedelta(days=TOMBSTONE_DAYS):
+                return None, [], None, stamp
+                
+            tasks = session.query(Task).filter(Task.updated_at >= since).populate_existing() \
+                .limit(SYNC_LIMIT + 1).all()
+            if len(tasks) > SYNC_LIMIT:
+                return None, [], None, stamp
+            deleted = set(session.execute(sa.select(TaskTombstone.task_id)
+                                          .where(TaskTombstone.deleted_at >= since)).scalars())
+            deleted -= {task.id for task in tasks}  # ids SQLite handed out again
+            
+            clause = search_clause(session, search)
+            if clause is not None and tasks:
+                matching = set(session.execute(sa.select(Task.id).where(
+                    Task.id.in_([task.id for task in tasks]), clause)).scalars())
+                deleted |= {task.id for task in tasks if task.id not in matching}
+                tasks = [task for task in tasks if task.id in matching]
+                
+            counts = count_by_status(session, search) if tasks or deleted else None
+            return self._remember(tasks), list(deleted), counts, stamp
+            
+    def board_stamp(self):
+        # (latest change, database time): the newest updated_at or tombstone,
+        # both read off an index, so callers can tell whether anything on the
+        # board changed without querying it. Like changes(), a commit may land
+        # up to SYNC_OVERLAP after its timestamp.
+        latest_update = sa.select(sa.func.max(Task.updated_at)).scalar_subquery()
+        latest_delete = sa.select(sa.func.max(TaskTombstone.deleted_at)).scalar_subquery()
+        with self.unit_of_work() as session:
+            updated, deleted, now = session.execute(sa.select(latest_update, latest_delete, utcnow())).one()
+        return max([stamp for stamp in (updated, deleted) if stamp is not None], default=None), now
+
+    def stats(self):
+        return pool_stats.snapshot()
+            
+    def close(self):
+        self.session.close()
@@ -0,0 +1,78 @@
+import functools
+
+# The board's own copy of the tasks it shows. Rows from the repository are
+# turned into TaskRecords as they arrive, so widgets never hold ORM objects
+# (with their instance state) and the strings a card displays are built
+# once per version instead of on every bind.
+
+# ---------- CONFIG ----------
+DATE_CACHE_SIZE = 4096   # formatted card dates kept, one per minute
+
+STATUS_TEXT = {'todo': 'TO-DO', 'doing': 'DOING', 'done': 'DONE'}
+
+@functools.lru_cache(maxsize=DATE_CACHE_SIZE)
+def _format_minute(minute):
+    return minute.strftime('%m/%d %H:%M')
+
+def format_date(created_at):
+    # Tasks created in the same minute share one string
+    return _format_minute(created_at.replace(second=0, microsecond=0))
+
+class TaskRecord:
+    # One task as the board sees it. Treated as immutable: a change is a new
+    # record (see replace()), so a card can compare old and new.
+    __slots__ = ('id', 'description', 'status', 'created_at', 'version',
+                 'sort_key', 'id_text', 'date_text')
+
+    def __init__(self, id, description, status, created_at, version):
+        self.id = id
+        self.description = description
+        self.status = status
+        self.created_at = created_at
+        self.version = version
+        self.sort_key = (created_at, id)  # column order, shared with the column's order list
+        self.id_text = f'#{id}'
+        self.date_text = format_date(created_at)
+
+    @classmethod
+    def of(cls, task, **changes):
+        # From a repository row (or another record), with fields overridden
+        if isinstance(task, cls) and not changes:
+            return task
+        values = {name: getattr(task, name) for name in ('id', 'description', 'status', 'created_at', 'version')}
+        values.update(changes)
+        return cls(**values)
+
+    def replace(self, **changes):
+        return self.of(self, **changes)
+
+    @property
+    def status_text(self):
+        return STATUS_TEXT[self.status]
+
+class TaskStore:
+    # The tasks currently placed on the board, by id
+    def __init__(self):
+        self.records = {}
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, task_id):
+        return task_id in self.records
+
+    def __iter__(self):
+        return iter(self.records.values())
+
+    def get(self, task_id):
+        return self.records.get(task_id)
+
+    def status(self, task_id):
+        record = self.records.get(task_id)
+        return record.status if record else None
+
+    def put(self, record):
+        self.records[record.id] = record
+
+    def pop(self, task_id):
+        return self.records.pop(task_id, None)
@@ -0,0 +1,41 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage
+from storage import OFFLINE_ERRORS, Base, TaskRepository, init_db
+
+# Every test runs on a fresh SQLite file, and on MySQL as well when the
+# server in storage.py's MYSQL_* settings is reachable. The MySQL run uses
+# its own database (TODO_TEST_MYSQL_DB) and drops its tables afterwards.
+TEST_MYSQL_DB = os.environ.get('TODO_TEST_MYSQL_DB', 'todo_db_test')
+
+def make_backend(name, tmp_path):
+    if name == 'sqlite':
+        return storage.SQLiteBackend(str(tmp_path / 'todo.db'))
+    url = storage.CONN_URL_DB.replace(f'/{storage.DB_NAME}?', f'/{TEST_MYSQL_DB}?')
+    return storage.MySQLBackend(url=url)
+
+@pytest.fixture(params=['sqlite', 'mysql'])
+def Session(request, tmp_path):
+    backend = make_backend(request.param, tmp_path)
+    try:
+        Session = init_db(backend)
+    except (RuntimeError, *OFFLINE_ERRORS) as e:
+        if request.param == 'sqlite':
+            raise
+        pytest.skip(f'MySQL not reachable: {e}')
+    engine = Session.kw['bind']
+    yield Session
+    if request.param == 'mysql':
+        Base.metadata.drop_all(engine)
+    engine.dispose()
+
+@pytest.fixture
+def repo(Session):
+    repo = TaskRepository(Session)
+    yield repo
+    repo.close()
@@ -0,0 +1,90 @@
+import http.client
+import json
+import socket
+
+import pytest
+
+from api_server import ApiServer
+from storage import TaskRepository
+
+@pytest.fixture
+def api(Session):
+    server = ApiServer(Session, '127.0.0.1', 0, workers=1)
+    server.start()
+    yield server
+    server.stop()
+
+def request(api, method, path, body=None, headers=None):
+    # Returns (status, headers, decoded JSON body or None)
+    conn = http.client.HTTPConnection('127.0.0.1', api.server.sockets[0].getsockname()[1], timeout=10)
+    try:
+        conn.request(method, path, json.dumps(body) if body is not None else None, headers or {})
+        response = conn.getresponse()
+        data = response.read()
+        return response.status, response.headers, json.loads(data) if data else None
+    finally:
+        conn.close()
+
+def raw_request(api, data):
+    # For requests http.client will not send; returns the status line
+    with socket.create_connection(api.server.sockets[0].getsockname()[:2], timeout=10) as conn:
+        conn.sendall(data)
+        return conn.makefile('rb').readline().decode('latin-1').strip()
+
+def test_create_and_page_with_cursor(api):
+    created = [request(api, 'POST', '/tasks', {'description': f'Task {i}', 'status': 'todo'}) for i in range(3)]
+    assert [status for status, _, _ in created] == [201] * 3
+    status, headers, task = created[0]
+    assert headers['ETag'] == '"1"' and headers['Location'] == f"/tasks/{task['id']}"
+
+    status, _, page = request(api, 'GET', '/tasks?status=todo&limit=2')
+    assert status == 200
+    assert [task['description'] for task in page['tasks']] == ['Task 0', 'Task 1']
+    status, _, page = request(api, 'GET', f"/tasks?status=todo&limit=2&cursor={page['next_cursor']}")
+    assert [task['description'] for task in page['tasks']] == ['Task 2']
+    assert page['next_cursor'] is None
+
+def test_matching_etag_gets_304(api):
+    request(api, 'POST', '/tasks', {'description': 'Cached', 'status': 'todo'})
+    _, headers, _ = request(api, 'GET', '/tasks?status=todo')
+    status, _, body = request(api, 'GET', '/tasks?status=todo', headers={'If-None-Match': headers['ETag']})
+    assert (status, body) == (304, None)
+
+    request(api, 'POST', '/tasks', {'description': 'Another', 'status': 'todo'})
+    status, _, page = request(api, 'GET', '/tasks?status=todo', headers={'If-None-Match': headers['ETag']})
+    assert status == 200 and len(page['tasks']) == 2
+
+def test_stale_if_match_gets_412(Session, api):
+    _, _, task = request(api, 'POST', '/tasks', {'description': 'Contested', 'status': 'todo'})
+    other = TaskRepository(Session)
+    try:
+        other.move(task['id'], 'doing')
+    finally:
+        other.close()
+
+    status, _, body = request(api, 'PATCH', f"/tasks/{task['id']}", {'status': 'done'}, {'If-Match': '"1"'})
+    assert status == 412 and body['task']['status'] == 'doing'
+    status, _, _ = request(api, 'DELETE', f"/tasks/{task['id']}", headers={'If-Match': '"1"'})
+    assert status == 412
+
+    status, headers, body = request(api, 'PATCH', f"/tasks/{task['id']}", {'status': 'done'}, {'If-Match': '"2"'})
+    assert (status, headers['ETag'], body['status']) == (200, '"3"', 'done')
+
+def test_stale_if_match_after_another_api_write(api):
+    _, _, task = request(api, 'POST', '/tasks', {'description': 'Two API clients', 'status': 'todo'})
+    assert request(api, 'PATCH', f"/tasks/{task['id']}", {'status': 'doing'}, {'If-Match': '"1"'})[0] == 200
+    # A second client still holding version 1
+    assert request(api, 'PATCH', f"/tasks/{task['id']}", {'status': 'done'}, {'If-Match': '"1"'})[0] == 412
+
+@pytest.mark.parametrize('path', ['/tasks?status=todo&cursor=not-a-cursor', '/tasks?status=nope', '/tasks?status=todo&limit=0'])
+def test_bad_query_gets_400(api, path):
+    assert request(api, 'GET', path)[0] == 400
+
+def test_bad_requests_get_400(api):
+    assert raw_request(api, b'GET /tasks?status=todo HTTP/1.1\r\nHost: x\r\nContent-Length: -5\r\n\r\n') \
+        == 'HTTP/1.1 400 Bad Request'
+    assert raw_request(api, b'GET /tasks?status=todo HTTP/1.1\r\nContent-Length: many\r\n\r\n') \
+        == 'HTTP/1.1 400 Bad Request'
+    assert raw_request(api, b'POST /tasks HTTP/1.1\r\nContent-Length: 100000\r\n\r\n') \
+        == 'HTTP/1.1 413 Request Entity Too Large'
+    assert request(api, 'POST', '/tasks', {'status': 'todo'})[0] == 400
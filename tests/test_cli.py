@@ -0,0 +1,59 @@
+import argparse
+import json
+from datetime import datetime
+
+import pytest
+
+from cli import cmd_import, task_values
+from storage import stream_tasks
+
+def import_file(Session, path, batch=2):
+    cmd_import(argparse.Namespace(file=str(path), format=None, batch=batch), Session)
+
+def descriptions(Session):
+    return [row.description for row in stream_tasks(Session)]
+
+def test_task_values():
+    assert task_values('{"description": " Ship it ", "status": "done", "created_at": "2024-05-01T09:30:00"}', 1) \
+        == {'description': 'Ship it', 'status': 'done', 'created_at': datetime(2024, 5, 1, 9, 30)}
+    values = task_values({'description': 'From CSV', 'status': '', 'created_at': ''}, 1)
+    assert values['status'] == 'todo' and isinstance(values['created_at'], datetime)
+
+@pytest.mark.parametrize('record, message', [
+    ('{"description": ', 'record 7: not valid JSON'),
+    ('["a list"]', 'record 7: expected an object with a description'),
+    ('{"description": 42}', 'record 7: description is required'),
+    ('{"description": "   "}', 'record 7: description is required'),
+    ('{"description": "x", "status": "later"}', "record 7: unknown status 'later'"),
+    ('{"description": "x", "created_at": "yesterday"}', "record 7: bad created_at 'yesterday'"),
+    ('{"description": "x", "created_at": 20240501}', "record 7: bad created_at '20240501'"),
+    ({'description': None, 'status': 'todo'}, 'record 7: description is required'),
+])
+def test_task_values_rejects_bad_records(record, message):
+    with pytest.raises(ValueError, match=message):
+        task_values(record, 7)
+
+def test_import_csv(Session, tmp_path):
+    path = tmp_path / 'tasks.csv'
+    path.write_text('description,status,created_at\n'
+                    'First,todo,2024-01-01T10:00:00\n'
+                    '"Second, with a comma",done,\n'
+                    'Third,,\n', encoding='utf-8')
+    import_file(Session, path)
+    assert descriptions(Session) == ['First', 'Second, with a comma', 'Third']
+    assert [row.status for row in stream_tasks(Session)] == ['todo', 'done', 'todo']
+
+def test_import_jsonl_skips_blank_lines(Session, tmp_path):
+    path = tmp_path / 'tasks.jsonl'
+    path.write_text('{"description": "One"}\n\n{"description": "Two", "status": "doing"}\n', encoding='utf-8')
+    import_file(Session, path)
+    assert descriptions(Session) == ['One', 'Two']
+
+def test_import_stops_at_bad_record_and_keeps_earlier_batches(Session, tmp_path):
+    path = tmp_path / 'tasks.jsonl'
+    lines = [json.dumps({'description': f'Task {i}'}) for i in range(3)] + ['not json', '{"description": "After"}']
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    with pytest.raises(SystemExit, match='Import stopped: record 4: not valid JSON.*earlier batches were kept'):
+        import_file(Session, path, batch=2)
+    # The first batch was committed, the one holding the bad record was not
+    assert descriptions(Session) == ['Task 0', 'Task 1']
@@ -0,0 +1,242 @@
+from datetime import datetime, timedelta
+
+import pytest
+import sqlalchemy as sa
+
+from journal import Journal, flush
+from storage import TOMBSTONE_DAYS, ConflictError, Task, TaskArchive, TaskRepository, TaskTombstone, insert_many
+
+def add_tasks(Session, count, status='todo', description='Task'):
+    start = datetime(2024, 1, 1)
+    rows = [{'description': f'{description} {i}', 'status': status, 'created_at': start + timedelta(minutes=i)}
+            for i in range(count)]
+    insert_many(Session, rows)
+
+def ids(tasks):
+    return [task.id for task in tasks]
+
+# ---------- single task writes ----------
+def test_create_move_delete(repo):
+    task = repo.create('Write tests', 'todo')
+    assert (task.description, task.status, task.version) == ('Write tests', 'todo', 1)
+
+    moved = repo.move(task.id, 'doing', task.version)
+    assert (moved.status, moved.version) == ('doing', 2)
+
+    repo.delete(task.id, moved.version)
+    assert repo.page('doing') == []
+    with pytest.raises(LookupError):
+        repo.move(task.id, 'done')
+
+def test_stale_version_is_refused(Session, repo):
+    task = repo.create('Shared task', 'todo')
+    other = TaskRepository(Session)
+    try:
+        other.move(task.id, 'doing', task.version)
+    finally:
+        other.close()
+
+    with pytest.raises(ConflictError) as error:
+        repo.move(task.id, 'done', task.version)
+    assert error.value.task.status == 'doing'
+    with pytest.raises(ConflictError):
+        repo.delete(task.id, task.version)
+
+# ---------- bulk writes ----------
+def test_move_many_bumps_versions(repo):
+    tasks = [repo.create(f'Task {i}', 'todo') for i in range(3)]
+    versions, conflicts = repo.move_many(ids(tasks), 'done', {task.id: task.version for task in tasks})
+    assert (versions, conflicts) == ({task.id: 2 for task in tasks}, [])
+    assert ids(repo.page('done')) == ids(tasks)
+    # Our own bulk write does not make the old version a conflict
+    assert repo.move(tasks[0].id, 'todo', tasks[0].version).version == 3
+
+def test_move_many_spans_chunks(Session, repo):
+    add_tasks(Session, TaskRepository.IN_CHUNK + 10)
+    task_ids = ids(repo.page('todo', limit=TaskRepository.IN_CHUNK + 10))
+    assert len(repo.move_many(task_ids, 'doing')[0]) == len(task_ids)
+    assert repo.load_board({'todo': 1})[1] == {'doing': len(task_ids)}
+
+def test_move_many_skips_tasks_changed_elsewhere(Session, repo):
+    tasks = [repo.create(f'Task {i}', 'todo') for i in range(3)]
+    other = TaskRepository(Session)
+    try:
+        other.move(tasks[0].id, 'doing')
+        other.delete(tasks[1].id)
+    finally:
+        other.close()
+
+    versions, conflicts = repo.move_many(ids(tasks), 'done', {task.id: task.version for task in tasks})
+    assert versions == {tasks[2].id: 2}
+    assert [(e.task_id, e.task and e.task.status) for e in conflicts] == [(tasks[0].id, 'doing'), (tasks[1].id, None)]
+    assert ids(repo.page('doing')) == [tasks[0].id]
+
+def test_move_all_and_delete_many(repo):
+    tasks = [repo.create(f'Task {i}', 'todo') for i in range(4)]
+    repo.create('Stays put', 'doing')
+    assert repo.move_all('todo', 'done') == 4
+
+    assert repo.delete_many(ids(tasks[:2]) + [10 ** 6]) == 2
+    assert ids(repo.page('done')) == ids(tasks[2:])
+
+# ---------- reads ----------
+def test_page_is_keyset_paged(Session, repo):
+    add_tasks(Session, 25)
+    seen = []
+    after = None
+    while True:
+        page = repo.page('todo', after=after, limit=10)
+        seen += page
+        if len(page) < 10:
+            break
+        after = (page[-1].created_at, page[-1].id)
+    assert len(seen) == 25
+    assert [task.created_at for task in seen] == sorted(task.created_at for task in seen)
+
+def test_load_board_counts(Session, repo):
+    add_tasks(Session, 5, 'todo')
+    add_tasks(Session, 3, 'done')
+    pages, counts = repo.load_board({'todo': 2, 'doing': 2, 'done': 2})
+    assert [len(pages[status]) for status in ('todo', 'doing', 'done')] == [2, 0, 2]
+    assert counts == {'todo': 5, 'done': 3}
+
+def test_search(repo):
+    groceries = repo.create('Buy groceries tomorrow', 'todo')
+    repo.create('Call the plumber', 'todo')
+    assert ids(repo.page('todo', search='groceries')) == [groceries.id]
+    assert ids(repo.page('todo', search='grocer')) == [groceries.id]  # prefix match
+    assert repo.load_board({'todo': 10}, search='plumber')[1] == {'todo': 1}
+    assert len(repo.page('todo', search='  ')) == 2
+
+def test_changes(repo):
+    kept = repo.create('Kept', 'todo')
+    deleted = repo.create('Deleted', 'todo')
+    tasks, removed, counts, stamp = repo.changes()
+    assert (tasks, removed, counts) == ([], [], None)
+
+    repo.move(kept.id, 'doing')
+    repo.delete(deleted.id)
+    tasks, removed, counts, _ = repo.changes(stamp)
+    assert {task.id: task.status for task in tasks} == {kept.id: 'doing'}
+    assert removed == [deleted.id]
+    assert counts == {'doing': 1}
+
+def test_changes_with_search_drops_non_matching(repo):
+    match = repo.create('Paint the fence', 'todo')
+    other = repo.create('Water plants', 'todo')
+    stamp = repo.changes()[3]
+    repo.move(match.id, 'doing')
+    repo.move(other.id, 'doing')
+    tasks, removed, _, _ = repo.changes(stamp, search='fence')
+    assert ids(tasks) == [match.id]
+    assert removed == [other.id]
+
+def test_prune_tombstones(Session, repo):
+    tasks = [repo.create(f'Task {i}', 'todo') for i in range(3)]
+    stamp = repo.changes()[3]
+    repo.delete_many(ids(tasks))
+    with Session.begin() as session:
+        session.execute(sa.update(TaskTombstone).values(deleted_at=datetime.utcnow() - timedelta(days=TOMBSTONE_DAYS + 1)))
+    assert repo.prune_tombstones() == 2
+    with Session() as session:
+        assert session.execute(sa.select(TaskTombstone.task_id)).scalars().all() == [tasks[-1].id]
+    # A poll from before the pruned window reloads instead of missing deletes
+    assert repo.changes(stamp - timedelta(days=TOMBSTONE_DAYS))[0] is None
+    assert repo.changes(stamp)[0] == []
+
+# ---------- archive ----------
+def test_archive_batches_and_history(Session, repo):
+    add_tasks(Session, 7, 'done')
+    repo.create('Still open', 'todo')
+    assert repo.archive_batch(batch=3) == 3
+    assert repo.archive(batch=3) == 4
+    assert repo.page('done') == []
+
+    history = repo.history(limit=5)
+    history += repo.history(after=(history[-1].archived_at, history[-1].id), limit=5)
+    assert sorted(row.description for row in history) == sorted(f'Task {i}' for i in range(7))
+
+    _, removed, _, _ = repo.changes(datetime.utcnow() - timedelta(minutes=1))
+    assert sorted(removed) == sorted(row.id for row in history)
+
+def test_archive_respects_age(Session, repo):
+    old = datetime.utcnow() - timedelta(days=3)
+    insert_many(Session, [{'description': 'Done long ago', 'status': 'done', 'created_at': old, 'updated_at': old}])
+    repo.move(repo.create('Just done', 'todo').id, 'done')
+    assert repo.archive(older_than=2) == 1
+    assert [row.description for row in repo.history()] == ['Done long ago']
+    assert [task.description for task in repo.page('done')] == ['Just done']
+
+def test_archived_ids_are_not_reused(Session, repo):
+    first = repo.create('First', 'done')
+    last = repo.create('Last', 'done')
+    assert repo.archive() == 2
+    task = repo.create('After the archive', 'todo')
+    assert task.id > last.id
+    with Session() as session:
+        assert session.get(TaskArchive, first.id).description == 'First'
+    # The next archive run has no primary key collision
+    repo.move(task.id, 'done')
+    assert repo.archive() == 1
+
+# ---------- journal replay ----------
+@pytest.fixture
+def journal(tmp_path):
+    journal = Journal(str(tmp_path / 'journal.jsonl'), fsync=False)
+    yield journal
+    journal.close()
+
+def test_apply_ops_follows_temporary_ids(repo, journal):
+    create = journal.append('create', description='Offline task', status='todo',
+                            created_at=datetime.utcnow().isoformat())
+    journal.append('move', create['temp_id'], status='doing', version=1)
+    results = flush(journal, repo)
+    assert [outcome for _, outcome, _ in results] == ['ok', 'ok']
+    created = results[0][2]
+    assert results[1][2].id == created.id and results[1][2].status == 'doing'
+    assert journal.pending() == []
+
+    journal.append('delete', create['temp_id'], version=2)
+    assert [outcome for _, outcome, _ in flush(journal, repo)] == ['ok']
+    assert repo.page('doing') == []
+
+def test_apply_ops_replay_is_idempotent(repo):
+    op = {'seq': 1, 'op_id': 'a' * 32, 'kind': 'create', 'task_id': None, 'temp_id': -1,
+          'description': 'Once', 'status': 'todo', 'created_at': datetime.utcnow().isoformat()}
+    [(outcome, task)] = repo.apply_ops([op])
+    assert outcome == 'ok'
+    [(outcome, replayed)] = repo.apply_ops([op])
+    assert (outcome, replayed.id) == ('ok', task.id)
+    assert ids(repo.page('todo')) == [task.id]
+
+    # Replayed after the task was deleted
+    repo.delete(task.id)
+    assert repo.apply_ops([op]) == [('missing', None)]
+
+def test_apply_ops_reports_conflicts_and_missing(Session, repo):
+    task = repo.create('Moved elsewhere', 'todo')
+    other = TaskRepository(Session)
+    try:
+        other.move(task.id, 'doing')
+    finally:
+        other.close()
+    ops = [
+        {'seq': 1, 'op_id': 'b' * 32, 'kind': 'move', 'task_id': task.id, 'status': 'done', 'version': 1},
+        {'seq': 2, 'op_id': 'c' * 32, 'kind': 'delete', 'task_id': 10 ** 6, 'version': 1},
+    ]
+    (conflict, error), missing = repo.apply_ops(ops)
+    assert conflict == 'conflict' and isinstance(error, ConflictError)
+    assert missing == ('missing', None)
+
+def test_flush_falls_back_to_one_op_per_transaction(repo, journal):
+    create = journal.append('create', description='Good', status='todo',
+                            created_at=datetime.utcnow().isoformat())
+    journal.append('create', description='Bad', status='todo', created_at='not a date')
+    journal.append('move', create['temp_id'], status='done', version=1)
+    results = flush(journal, repo)
+    assert [outcome for _, outcome, _ in results] == ['ok', 'failed', 'ok']
+    assert results[2][2].id == results[0][2].id
+    assert journal.pending() == []
+
+    with repo.unit_of_work() as session:
+        assert session.execute(sa.select(sa.func.count()).select_from(Task)).scalar() == 1